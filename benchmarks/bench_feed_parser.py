@@ -0,0 +1,172 @@
+"""Benchmark del parser rápido de feeds (feed_parser) frente a feedparser.
+
+Por defecto descarga los feeds de producción (_RSS_SOURCES) una vez y mide
+solo el parseo, repitiéndolo varias veces. Comprueba además que los dos
+parsers producen los mismos items (_entry_to_item). Uso:
+
+    python benchmarks/bench_feed_parser.py
+    python benchmarks/bench_feed_parser.py --files marca.xml sport.xml --repeat 50
+    python benchmarks/bench_feed_parser.py --synthetic --json parser.json
+
+Los sintéticos incluyen dos feeds Atom con contenido XHTML.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def build_atom_feed(feed_index: int, items: int, item_size: int, rng: random.Random) -> bytes:
+    """Feed Atom con el contenido en XHTML (type="xhtml") y un resumen que
+    repite el primer párrafo, como publican algunos medios."""
+    from email.utils import formatdate
+    from xml.sax.saxutils import escape
+
+    from bench_pipeline import _CLUB_TITLES, _DOMAINS, _VOCABULARY
+    from feed_parser import _parse_date
+
+    now = time.time()
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<feed xmlns="http://www.w3.org/2005/Atom">',
+        f"<title>Bench atom {feed_index}</title>",
+    ]
+    for item_index in range(items):
+        club = _CLUB_TITLES[(feed_index + item_index) % len(_CLUB_TITLES)]
+        title = f"{club}: {' '.join(rng.sample(_VOCABULARY, 6))} {feed_index}x{item_index}"
+        paragraphs: list[str] = []
+        while sum(len(paragraph) + 1 for paragraph in paragraphs) < item_size:
+            paragraphs.append(" ".join(rng.choice(_VOCABULARY) + str(rng.randint(0, 9999)) for _ in range(12)))
+        link = f"https://{_DOMAINS[feed_index % len(_DOMAINS)]}/futbol/2026/10/17/atom-{feed_index}-{item_index}.html"
+        published = _parse_date(formatdate(now - rng.randint(60, 36 * 3600), usegmt=True))
+        xhtml = "".join(f"<p>{escape(paragraph)}</p>" for paragraph in paragraphs)
+        parts.append(
+            "<entry>"
+            f"<title>{escape(title)}</title>"
+            f"<id>{escape(link)}</id>"
+            f'<link rel="alternate" href="{escape(link)}"/>'
+            f"<updated>{time.strftime('%Y-%m-%dT%H:%M:%SZ', published)}</updated>"
+            f"<summary>{escape(paragraphs[0])}</summary>"
+            f'<content type="xhtml"><div xmlns="http://www.w3.org/1999/xhtml">{xhtml}</div></content>'
+            "</entry>"
+        )
+    parts.append("</feed>")
+    return "".join(parts).encode("utf-8")
+
+
+def load_feeds(args) -> list[tuple[str, bytes]]:
+    if args.files:
+        feeds = []
+        for path in args.files:
+            with open(path, "rb") as handle:
+                feeds.append((os.path.basename(path), handle.read()))
+        return feeds
+    if args.synthetic:
+        from bench_pipeline import build_feed
+
+        rng = random.Random(0)
+        return [
+            (f"Sintético {index}", build_feed(index, args.items_per_feed, args.item_size, rng))
+            for index in range(6)
+        ] + [
+            (f"Atom xhtml {index}", build_atom_feed(index, args.items_per_feed, args.item_size, rng))
+            for index in range(2)
+        ]
+
+    import macro_engine
+    from http_client import HttpClient
+
+    client = HttpClient(max_per_host=1)
+    feeds = []
+    for source in macro_engine._RSS_SOURCES:
+        try:
+            response = client.get(source["url"], timeout=20)
+            response.raise_for_status()
+        except Exception as exc:
+            print(f"[!] {source['name']}: no se pudo descargar ({exc})")
+            continue
+        feeds.append((source["name"], response.content))
+    return feeds
+
+
+def time_parser(parse, content: bytes, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        parse(content)
+    return (time.perf_counter() - started) / repeat
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", nargs="*", help="feeds ya descargados en disco")
+    parser.add_argument("--synthetic", action="store_true", help="feeds sintéticos RSS y Atom, sin red")
+    parser.add_argument("--items-per-feed", type=int, default=50)
+    parser.add_argument("--item-size", type=int, default=1500, help="bytes de texto por item (sintéticos)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", dest="json_path", help="guardar resultados en JSON")
+    args = parser.parse_args()
+
+    import feedparser
+
+    import feed_parser
+    import macro_engine
+
+    feeds = load_feeds(args)
+    if not feeds:
+        print("[!] No hay feeds que medir.")
+        return 1
+
+    results = []
+    total_slow = total_fast = 0.0
+    for name, content in feeds:
+        try:
+            fast_entries = feed_parser.parse_entries(content)
+        except feed_parser.FastFeedError as exc:
+            print(f"{name:<18} fallback a feedparser ({exc})")
+            results.append({"feed": name, "bytes": len(content), "fallback": str(exc)})
+            continue
+        slow_entries = feedparser.parse(content).entries
+        fast_items = [macro_engine._entry_to_item(entry, name, 0) for entry in fast_entries]
+        slow_items = [macro_engine._entry_to_item(entry, name, 0) for entry in slow_entries]
+        mismatches = sum(1 for fast, slow in zip(fast_items, slow_items) if fast != slow)
+        mismatches += abs(len(fast_items) - len(slow_items))
+
+        slow = time_parser(feedparser.parse, content, args.repeat)
+        fast = time_parser(feed_parser.parse_entries, content, args.repeat)
+        total_slow += slow
+        total_fast += fast
+        results.append(
+            {
+                "feed": name,
+                "bytes": len(content),
+                "entries": len(fast_entries),
+                "feedparser_ms": round(slow * 1000, 2),
+                "fast_ms": round(fast * 1000, 2),
+                "speedup": round(slow / fast, 1) if fast else 0.0,
+                "mismatched_items": mismatches,
+            }
+        )
+        print(
+            f"{name:<18} {len(content) / 1024:>7.1f}KB entries={len(fast_entries):>3} "
+            f"feedparser={slow * 1000:>8.2f}ms fast={fast * 1000:>7.2f}ms "
+            f"x{slow / fast if fast else 0:>5.1f} distintos={mismatches}"
+        )
+
+    if total_fast:
+        print(
+            f"{'TOTAL':<18} feedparser={total_slow * 1000:.2f}ms fast={total_fast * 1000:.2f}ms "
+            f"x{total_slow / total_fast:.1f}"
+        )
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
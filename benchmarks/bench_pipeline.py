@@ -0,0 +1,365 @@
+"""Benchmark offline de build_macro_drafts + envío a Telegram.
+
+Levanta en local un servidor HTTP que hace de:
+  - feeds RSS sintéticos (/rss/<n>.xml), con latencia configurable,
+  - API compatible OpenAI (/v1/chat/completions), con latencia y tasa de fallos,
+  - Bot API de Telegram (/bot<token>/<método>).
+
+No necesita red. Uso:
+
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --feeds 6,50,500 --llm-latency 0.2 --json bench.json
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_VOCABULARY = [
+    "partido", "entrenador", "vestuario", "fichaje", "lesion", "remontada", "defensa",
+    "delantero", "portero", "centro", "campo", "grada", "aficion", "arbitro", "penalti",
+    "tarjeta", "temporada", "jornada", "clasico", "derbi", "champions", "liga", "copa",
+    "contrato", "renovacion", "cantera", "titular", "suplente", "gol", "asistencia",
+]
+_CLUB_TITLES = ["Real Madrid", "Barcelona", "Bernabéu", "Barça"]
+_DOMAINS = ["www.marca.com", "www.sport.es", "as.com", "www.mundodeportivo.com"]
+
+
+class BenchState:
+    def __init__(self, args):
+        self.args = args
+        self.feeds: dict[int, bytes] = {}
+        self.lock = threading.Lock()
+        self.llm_calls = 0
+        self.llm_failures = 0
+        self.telegram_calls = 0
+        self.bytes_served = 0
+        self.last_prompt = ""
+
+
+def build_feed(feed_index: int, items: int, item_size: int, rng: random.Random) -> bytes:
+    now = time.time()
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<rss version="2.0"><channel>',
+        f"<title>Bench feed {feed_index}</title><link>http://bench.local/</link>",
+    ]
+    for item_index in range(items):
+        club = _CLUB_TITLES[(feed_index + item_index) % len(_CLUB_TITLES)]
+        words = rng.sample(_VOCABULARY, 6)
+        title = f"{club}: {' '.join(words)} {feed_index}x{item_index}"
+        body_words: list[str] = []
+        while sum(len(word) + 1 for word in body_words) < item_size:
+            body_words.append(rng.choice(_VOCABULARY) + str(rng.randint(0, 9999)))
+        domain = _DOMAINS[feed_index % len(_DOMAINS)]
+        link = f"https://{domain}/futbol/2026/10/17/bench-{feed_index}-{item_index}.html"
+        published = formatdate(now - rng.randint(60, 36 * 3600), usegmt=True)
+        parts.append(
+            "<item>"
+            f"<title>{escape(title)}</title>"
+            f"<link>{escape(link)}</link>"
+            f"<guid>{escape(link)}</guid>"
+            f"<description>{escape('<p>' + ' '.join(body_words) + '</p>')}</description>"
+            f"<pubDate>{published}</pubDate>"
+            "</item>"
+        )
+    parts.append("</channel></rss>")
+    return "".join(parts).encode("utf-8")
+
+
+def fake_completion(prompt: str) -> str:
+    match = re.search(r"^NOTICIA: (.*)$", prompt, re.MULTILINE)
+    noticia = match.group(1) if match else "Real Madrid partido"
+    words = [word for word in re.findall(r"\w{4,}", noticia)][:3] or ["Madrid"]
+    return (
+        f"Resumen breve: {noticia[:100]}\n###\n"
+        f"¿Cómo se explica lo de {' '.join(words)} a estas alturas de temporada?\n"
+        "Fuente: @bench\n#RealMadrid"
+    )
+
+
+def fake_batch_completion(prompt: str) -> str:
+    posts = [
+        {"id": int(number), "respuesta": fake_completion(f"NOTICIA: {noticia}")}
+        for number, noticia in re.findall(r"^\[(\d+)\]\nNOTICIA: (.*)$", prompt, re.MULTILINE)
+    ]
+    return json.dumps({"posts": posts}, ensure_ascii=False)
+
+
+def make_handler(state: BenchState):
+    args = state.args
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *_):
+            pass
+
+        def _send(self, status: int, body: bytes, content_type: str) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            with state.lock:
+                state.bytes_served += len(body)
+
+        def _read_json(self) -> dict:
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                return json.loads(raw or b"{}")
+            from urllib.parse import parse_qs
+
+            return {key: values[0] for key, values in parse_qs(raw.decode("utf-8")).items()}
+
+        def do_GET(self):
+            match = re.match(r"^/rss/(\d+)\.xml", self.path)
+            if not match:
+                self._send(404, b"not found", "text/plain")
+                return
+            time.sleep(args.feed_latency)
+            body = state.feeds.get(int(match.group(1)), b"")
+            self._send(200, body, "application/rss+xml")
+
+        def do_POST(self):
+            if self.path.endswith("/chat/completions"):
+                self._chat_completion()
+                return
+            match = re.match(r"^/bot[^/]+/(\w+)", self.path)
+            if match:
+                self._telegram(match.group(1))
+                return
+            self._send(404, b"not found", "text/plain")
+
+        def _chat_completion(self):
+            payload = self._read_json()
+            time.sleep(args.llm_latency)
+            with state.lock:
+                state.llm_calls += 1
+                fail = random.random() < args.llm_failure_rate
+                if fail:
+                    state.llm_failures += 1
+            if fail:
+                body = json.dumps({"error": {"message": "bench failure", "type": "server_error"}})
+                self._send(500, body.encode("utf-8"), "application/json")
+                return
+            prompt = (payload.get("messages") or [{}])[-1].get("content") or ""
+            if payload.get("response_format"):
+                content = fake_batch_completion(prompt)
+            else:
+                content = fake_completion(prompt)
+            # Caché de prefijos al estilo DeepSeek: bloques de 64 tokens
+            # compartidos con la petición anterior.
+            with state.lock:
+                shared = len(os.path.commonprefix([state.last_prompt, prompt]))
+                state.last_prompt = prompt
+            prompt_tokens = len(prompt) // 4
+            cache_hit_tokens = (shared // 4) // 64 * 64
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (len(prompt) + len(content)) // 4,
+                "prompt_cache_hit_tokens": cache_hit_tokens,
+                "prompt_cache_miss_tokens": prompt_tokens - cache_hit_tokens,
+            }
+            if payload.get("stream"):
+                self._send_stream(payload, content, usage)
+                return
+            body = {
+                "id": "bench",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload.get("model") or "deepseek-chat",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+            self._send(200, json.dumps(body).encode("utf-8"), "application/json")
+
+        def _send_stream(self, payload: dict, content: str, usage: dict) -> None:
+            base = {
+                "id": "bench",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": payload.get("model") or "deepseek-chat",
+            }
+            events = []
+            for start in range(0, len(content), 16):
+                delta = {"content": content[start:start + 16]}
+                choice = {"index": 0, "delta": delta, "finish_reason": None}
+                events.append({**base, "choices": [choice]})
+            events.append({**base, "choices": [], "usage": usage})
+            body = "".join(f"data: {json.dumps(event)}\n\n" for event in events)
+            self._send(200, (body + "data: [DONE]\n\n").encode("utf-8"), "text/event-stream")
+
+        def _telegram(self, method: str):
+            payload = self._read_json()
+            time.sleep(args.telegram_latency)
+            with state.lock:
+                state.telegram_calls += 1
+                message_id = state.telegram_calls
+            result = {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": int(payload.get("chat_id") or 1), "type": "private"},
+                "text": payload.get("text") or "",
+            }
+            body = json.dumps({"ok": True, "result": result if method == "sendMessage" else True})
+            self._send(200, body.encode("utf-8"), "application/json")
+
+    return Handler
+
+
+def run_scenario(feed_count: int, state: BenchState, base_url: str) -> dict:
+    import macro_engine
+    import scheduled_run
+
+    args = state.args
+    rng = random.Random(feed_count)
+    state.feeds = {
+        index: build_feed(index, args.items_per_feed, args.item_size, rng)
+        for index in range(feed_count)
+    }
+    state.llm_calls = state.llm_failures = state.telegram_calls = state.bytes_served = 0
+    macro_engine._RSS_SOURCES = [
+        {"name": f"Bench {index}", "url": f"{base_url}/rss/{index}.xml"}
+        for index in range(feed_count)
+    ]
+
+    stage_times = {"fetch": 0.0, "select": 0.0}
+    original_fetch = macro_engine.get_hot_macro_news
+    original_select = macro_engine.select_diverse_news
+
+    def timed(stage, func):
+        def wrapper(*a, **kw):
+            started = time.perf_counter()
+            try:
+                return func(*a, **kw)
+            finally:
+                stage_times[stage] += time.perf_counter() - started
+
+        return wrapper
+
+    macro_engine.get_hot_macro_news = timed("fetch", original_fetch)
+    macro_engine.select_diverse_news = timed("select", original_select)
+    try:
+        config = macro_engine.RunConfig.from_env()
+        tracemalloc.start()
+        started = time.perf_counter()
+        drafts = macro_engine.build_macro_drafts(config)
+        built_at = time.perf_counter()
+        sent = scheduled_run.send_drafts_scheduled(drafts, "123:bench", 1, config)
+        finished = time.perf_counter()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        macro_engine.get_hot_macro_news = original_fetch
+        macro_engine.select_diverse_news = original_select
+
+    total = finished - started
+    items = feed_count * args.items_per_feed
+    return {
+        "feeds": feed_count,
+        "items": items,
+        "drafts": len(drafts),
+        "sent": sent,
+        "wall_secs": round(total, 3),
+        "fetch_secs": round(stage_times["fetch"], 3),
+        "select_secs": round(stage_times["select"], 3),
+        "generate_secs": round(built_at - started - stage_times["fetch"] - stage_times["select"], 3),
+        "send_secs": round(finished - built_at, 3),
+        "items_per_sec": round(items / stage_times["fetch"], 1) if stage_times["fetch"] else 0.0,
+        "llm_calls": state.llm_calls,
+        "llm_failures": state.llm_failures,
+        "telegram_calls": state.telegram_calls,
+        "feed_mb": round(state.bytes_served / 1e6, 2),
+        "peak_mem_mb": round(peak / 1e6, 1),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--feeds", default="6,50,200,500", help="lista de escenarios (nº de feeds)")
+    parser.add_argument("--items-per-feed", type=int, default=25)
+    parser.add_argument("--item-size", type=int, default=1500, help="bytes de texto por item")
+    parser.add_argument("--feed-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--telegram-latency", type=float, default=0.02)
+    parser.add_argument("--max-drafts", type=int, default=12)
+    parser.add_argument("--json", dest="json_path", help="guardar resultados en JSON")
+    args = parser.parse_args()
+
+    os.environ.update(
+        {
+            "CACHE_DIR": tempfile.mkdtemp(prefix="ai_posts_bench_"),
+            "DEEPSEEK_API_KEY": "bench",
+            "MAX_DRAFTS": str(args.max_drafts),
+            "RSS_HTTP_CACHE": "0",
+            "SKIP_PROCESSED_NEWS": "0",
+            "LLM_CACHE": "0",
+            "LLM_MAX_RPM": "100000",
+            "TELEGRAM_CHAT_MSGS_PER_MIN": "100000",
+            "TELEGRAM_GLOBAL_MSGS_PER_SEC": "100000",
+            "RSS_FETCH_DEADLINE_SECS": "600",
+            "MAX_NEWS_AGE_DAYS": "3",
+            "ONLY_TODAY": "0",
+        }
+    )
+    state = BenchState(args)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["DEEPSEEK_BASE_URL"] = f"{base_url}/v1"
+
+    import telebot.apihelper
+
+    telebot.apihelper.API_URL = base_url + "/bot{0}/{1}"
+
+    import builtins
+
+    results = []
+    real_print = builtins.print
+    for feed_count in [int(value) for value in args.feeds.split(",") if value.strip()]:
+        builtins.print = lambda *a, **kw: None
+        try:
+            result = run_scenario(feed_count, state, base_url)
+        finally:
+            builtins.print = real_print
+        results.append(result)
+        print(
+            f"feeds={result['feeds']:>4} items={result['items']:>6} drafts={result['drafts']:>3} "
+            f"wall={result['wall_secs']:>7.2f}s fetch={result['fetch_secs']:>6.2f}s "
+            f"select={result['select_secs']:>6.2f}s generate={result['generate_secs']:>6.2f}s "
+            f"send={result['send_secs']:>5.2f}s items/s={result['items_per_sec']:>8.1f} "
+            f"peak={result['peak_mem_mb']:>6.1f}MB"
+        )
+
+    server.shutdown()
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
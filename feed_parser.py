@@ -0,0 +1,181 @@
+import calendar
+import io
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+_ATOM_NS = "{http://www.w3.org/2005/Atom}"
+_CONTENT_ENCODED = "{http://purl.org/rss/1.0/modules/content/}encoded"
+_DC_DATE = "{http://purl.org/dc/elements/1.1/}date"
+
+_ITEM_TAGS = {"item", f"{_ATOM_NS}entry"}
+
+# Entradas antiguas seguidas (en un feed ordenado de más nueva a más antigua)
+# tras las que se da por hecho que no quedan noticias recientes.
+_OLD_RUN_TO_STOP = 5
+
+
+class FastFeedError(ValueError):
+    """El documento no es RSS 2.0/Atom bien formado; hay que usar feedparser."""
+
+
+class ParseStats:
+    """Qué hizo `parse_entries` con los límites que se le pasaron."""
+
+    def __init__(self):
+        self.seen = 0
+        self.skipped_old = 0
+        self.stopped_early = False
+
+
+def parse_entries(
+    content: bytes,
+    max_entries: int = 0,
+    min_timestamp: Optional[float] = None,
+    stats: Optional[ParseStats] = None,
+) -> list[dict]:
+    """Parser rápido de RSS 2.0 y Atom con `iterparse`.
+
+    Devuelve entradas con las mismas claves que `feedparser` para lo que usa
+    `_entry_to_item` (title, link, links, id, summary, summary_detail,
+    content, published_parsed, updated_parsed) y lanza `FastFeedError` ante
+    cualquier cosa que no sepa leer igual que él (XML mal formado, RSS 1.0,
+    codificaciones que expat no conoce...).
+
+    Límites opcionales, para no leer ni construir entradas que se van a tirar:
+    - `max_entries`: deja de leer tras las N primeras entradas del documento
+      (las mismas que dejaría un `entries[:N]`).
+    - `min_timestamp`: omite las entradas con fecha anterior y deja de leer
+      tras varias seguidas si hasta ahí todas las fechas venían ordenadas de
+      más nueva a más antigua. Las entradas sin fecha se conservan.
+    """
+    stats = stats if stats is not None else ParseStats()
+    entries: list[dict] = []
+    root_tag = None
+    previous_ts: Optional[float] = None
+    newest_first = True
+    old_run = 0
+    try:
+        for event, element in ET.iterparse(io.BytesIO(content), events=("start", "end")):
+            if event == "start":
+                if root_tag is None:
+                    root_tag = element.tag
+                    if root_tag not in ("rss", f"{_ATOM_NS}feed"):
+                        raise FastFeedError(f"raíz no soportada: {root_tag}")
+                continue
+            if element.tag not in _ITEM_TAGS:
+                continue
+            entry = _rss_entry(element) if root_tag == "rss" else _atom_entry(element)
+            element.clear()
+            stats.seen += 1
+            timestamp = _entry_timestamp(entry)
+            if timestamp is not None:
+                if previous_ts is not None and timestamp > previous_ts:
+                    newest_first = False
+                previous_ts = timestamp
+            if min_timestamp is not None and timestamp is not None and timestamp < min_timestamp:
+                stats.skipped_old += 1
+                old_run += 1
+                if newest_first and old_run >= _OLD_RUN_TO_STOP:
+                    stats.stopped_early = True
+                    break
+            else:
+                old_run = 0
+                entries.append(entry)
+            if max_entries > 0 and stats.seen >= max_entries:
+                stats.stopped_early = True
+                break
+    except ET.ParseError as exc:
+        raise FastFeedError(str(exc)) from exc
+    if root_tag is None:
+        raise FastFeedError("documento vacío")
+    return entries
+
+
+def _entry_timestamp(entry: dict) -> Optional[float]:
+    value = entry.get("published_parsed") or entry.get("updated_parsed")
+    return float(calendar.timegm(value)) if value else None
+
+
+def _text(element: Optional[ET.Element]) -> str:
+    if element is None:
+        return ""
+    if len(element) == 0:
+        return (element.text or "").strip()
+    # Contenido con elementos hijos (Atom type="xhtml"): cada etiqueta separa
+    # palabras, como al quitar el HTML que devuelve feedparser.
+    return " ".join(part.strip() for part in element.itertext() if part.strip())
+
+
+def _with_summary(entry: dict, summary: str) -> dict:
+    if summary:
+        entry["summary"] = summary
+        entry["summary_detail"] = {"value": summary}
+    return entry
+
+
+def _rss_entry(item: ET.Element) -> dict:
+    entry: dict = {"title": _text(item.find("title"))}
+    link = _text(item.find("link"))
+    guid_element = item.find("guid")
+    guid = _text(guid_element)
+    if guid:
+        entry["id"] = guid
+        # Igual que feedparser: un guid permalink hace de enlace si no hay <link>.
+        if not link and (guid_element.get("isPermaLink") or "true").lower() != "false":
+            link = guid
+    if link:
+        entry["link"] = link
+        entry["links"] = [{"rel": "alternate", "href": link}]
+    encoded = _text(item.find(_CONTENT_ENCODED))
+    if encoded:
+        entry["content"] = [{"value": encoded}]
+    published = _parse_date(_text(item.find("pubDate"))) or _parse_date(_text(item.find(_DC_DATE)))
+    if published:
+        entry["published_parsed"] = published
+    return _with_summary(entry, _text(item.find("description")))
+
+
+def _atom_entry(entry_element: ET.Element) -> dict:
+    entry: dict = {"title": _text(entry_element.find(f"{_ATOM_NS}title"))}
+    entry_id = _text(entry_element.find(f"{_ATOM_NS}id"))
+    if entry_id:
+        entry["id"] = entry_id
+    links = []
+    for link_element in entry_element.findall(f"{_ATOM_NS}link"):
+        href = (link_element.get("href") or "").strip()
+        if href:
+            links.append({"rel": link_element.get("rel") or "alternate", "href": href})
+    if links:
+        entry["links"] = links
+        alternate = next((link for link in links if link["rel"] == "alternate"), None)
+        if alternate:
+            entry["link"] = alternate["href"]
+    content = _text(entry_element.find(f"{_ATOM_NS}content"))
+    if content:
+        entry["content"] = [{"value": content}]
+    published = _parse_date(_text(entry_element.find(f"{_ATOM_NS}published")))
+    if published:
+        entry["published_parsed"] = published
+    updated = _parse_date(_text(entry_element.find(f"{_ATOM_NS}updated")))
+    if updated:
+        entry["updated_parsed"] = updated
+    return _with_summary(entry, _text(entry_element.find(f"{_ATOM_NS}summary")))
+
+
+def _parse_date(raw: str) -> Optional[time.struct_time]:
+    """Fecha RFC 822 (RSS) o ISO 8601 (Atom, dc:date) como struct_time UTC."""
+    if not raw:
+        return None
+    try:
+        if raw[:4].isdigit():
+            value = datetime.fromisoformat(raw)
+        else:
+            value = parsedate_to_datetime(raw)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).timetuple()
@@ -0,0 +1,191 @@
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import metrics as run_metrics
+
+USER_AGENT = "Mozilla/5.0 (compatible; ai_posts/1.0)"
+
+# Segundos de conexión (TCP + TLS) acumulados por la petición en curso de
+# cada hilo; urllib3 no expone cuánto de una petición fue handshake.
+_handshake = threading.local()
+
+
+def _record_connect(connect):
+    def timed_connect(self) -> None:
+        started = time.perf_counter()
+        try:
+            connect(self)
+        finally:
+            _handshake.seconds = getattr(_handshake, "seconds", 0.0) + time.perf_counter() - started
+            _handshake.connections = getattr(_handshake, "connections", 0) + 1
+
+    return timed_connect
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    connect = _record_connect(HTTPConnection.connect)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    connect = _record_connect(HTTPSConnection.connect)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class DownloadAborted(requests.exceptions.RequestException):
+    """Descarga abandonada por tamaño (`reason="too_large"`) o por tiempo (`"too_slow"`)."""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+_DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+
+def _too_slow(deadline_secs: float) -> DownloadAborted:
+    return DownloadAborted("too_slow", f"descarga sin terminar tras {deadline_secs:.0f}s")
+
+
+def _expire(response: requests.Response, expired: threading.Event) -> None:
+    # Corta la lectura en curso desde otro hilo: close() no despierta a un
+    # recv() bloqueado, shutdown() sí (la lectura termina con un error).
+    expired.set()
+    sock = getattr(getattr(response.raw, "connection", None), "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class HttpClient:
+    """Sesión HTTP compartida por hilos y ejecuciones.
+
+    Reutiliza conexiones (keep-alive) con un pool por host de como mucho
+    `max_per_host` conexiones (las peticiones de más esperan turno), pide
+    gzip/deflate y descomprime de forma transparente, y anota por host el
+    tiempo de handshake (TCP + TLS de las conexiones nuevas) y el de la
+    petición en sí.
+    """
+
+    def __init__(self, max_per_host: int, max_hosts: int = 32):
+        adapter = _PooledAdapter(
+            pool_connections=max(max_hosts, 1),
+            pool_maxsize=max(max_per_host, 1),
+            pool_block=True,
+            max_retries=0,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"}
+        )
+
+    @staticmethod
+    @contextmanager
+    def _timed(url: str) -> Iterator[None]:
+        host = urlsplit(url).hostname or ""
+        metrics = run_metrics.current()
+        _handshake.seconds = 0.0
+        _handshake.connections = 0
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            handshake = _handshake.seconds
+            if _handshake.connections:
+                metrics.inc("http_connections", _handshake.connections, host=host, kind="new")
+                metrics.observe("http_handshake_seconds", handshake, host=host)
+            else:
+                metrics.inc("http_connections", host=host, kind="reused")
+            metrics.observe("http_transfer_seconds", elapsed - handshake, host=host)
+
+    def get(self, url: str, timeout: float, headers: Optional[dict] = None, **kwargs) -> requests.Response:
+        with self._timed(url):
+            return self.session.get(url, timeout=timeout, headers=headers, **kwargs)
+
+    def download(
+        self,
+        url: str,
+        timeout: float,
+        headers: Optional[dict] = None,
+        max_bytes: int = 0,
+        deadline_secs: float = 0,
+    ) -> tuple[requests.Response, bytes]:
+        """GET en streaming que devuelve la respuesta y el cuerpo ya leído.
+
+        Lanza `DownloadAborted` (y suelta la conexión) si el cuerpo, ya
+        descomprimido, pasa de `max_bytes` o si la descarga sigue abierta
+        `deadline_secs` después de empezar, aunque el servidor vaya mandando
+        bytes sueltos; `timeout` sigue acotando cada lectura por separado.
+        Con 0 no hay límite.
+        """
+        deadline = time.monotonic() + deadline_secs if deadline_secs > 0 else None
+        with self._timed(url):
+            response = self.session.get(url, timeout=timeout, headers=headers, stream=True)
+            expired = threading.Event()
+            timer = None
+            try:
+                try:
+                    declared = int(response.headers.get("Content-Length") or 0)
+                except ValueError:
+                    declared = 0
+                if max_bytes > 0 and declared > max_bytes:
+                    raise DownloadAborted("too_large", f"Content-Length {declared} > {max_bytes} bytes")
+                if deadline is not None:
+                    timer = threading.Timer(
+                        max(deadline - time.monotonic(), 0), _expire, (response, expired)
+                    )
+                    timer.daemon = True
+                    timer.start()
+                chunks: list[bytes] = []
+                received = 0
+                try:
+                    for chunk in response.iter_content(_DOWNLOAD_CHUNK_BYTES):
+                        received += len(chunk)
+                        if max_bytes > 0 and received > max_bytes:
+                            raise DownloadAborted("too_large", f"más de {max_bytes} bytes")
+                        chunks.append(chunk)
+                except Exception as exc:
+                    if expired.is_set() and not isinstance(exc, DownloadAborted):
+                        raise _too_slow(deadline_secs) from exc
+                    raise
+                if expired.is_set():
+                    raise _too_slow(deadline_secs)
+            except BaseException:
+                response.close()
+                raise
+            finally:
+                if timer is not None:
+                    timer.cancel()
+        return response, b"".join(chunks)
+
+    def close(self) -> None:
+        self.session.close()
@@ -1,15 +1,35 @@
 import calendar
 import html
+import json
 import os
+import queue
+import random
 import re
+import threading
 import time
-from datetime import datetime
-from typing import Optional
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone, tzinfo
+from typing import Callable, Iterator, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
 
 import feedparser
 import requests
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import APIConnectionError, APIStatusError, OpenAI, RateLimitError
+
+import feed_parser
+from http_client import DownloadAborted, HttpClient
+import metrics as run_metrics
+from rate_limit import CircuitBreaker, TokenBucket
+from storage import (
+    FeedValidatorCache,
+    LlmResponseCache,
+    ProcessedNewsStore,
+    WatermarkStore,
+    get_cache_dir,
+)
 try:
     from zoneinfo import ZoneInfo
 except ImportError:  # pragma: no cover (py<3.9)
@@ -22,18 +42,57 @@ DEFAULT_MAX_DRAFTS = 12
 DEFAULT_REAL_SHARE = 3
 DEFAULT_BARCA_SHARE = 1
 DEFAULT_RSS_TIMEOUT = 20
+DEFAULT_RSS_MAX_MB = 5
+DEFAULT_RSS_READ_DEADLINE = 30
 DEFAULT_RSS_MAX_ITEMS_PER_FEED = 25
 DEFAULT_RSS_CONTENT_LIMIT = 1200
+DEFAULT_RSS_FETCH_WORKERS = 8
+DEFAULT_RSS_FETCH_DEADLINE = 90
+DEFAULT_RSS_HTTP_CACHE = True
+DEFAULT_RSS_FAST_PARSER = True
+DEFAULT_HTTP_MAX_PER_HOST = 4
+DEFAULT_SKIP_PROCESSED_NEWS = True
+DEFAULT_PROCESSED_TTL_HOURS = 96.0
+DEFAULT_LLM_CACHE = True
+DEFAULT_LLM_CACHE_MAX_AGE_HOURS = 72.0
+DEFAULT_LLM_CACHE_MAX_MB = 20
+DEFAULT_LLM_MAX_CONCURRENT = 4
+DEFAULT_LLM_MAX_RPM = 60
+DEFAULT_LLM_MAX_RETRIES = 3
+DEFAULT_LLM_RATE_LIMIT_BACKOFF = 5.0
+DEFAULT_LLM_RETRY_BACKOFF = 1.0
+DEFAULT_LLM_TIMEOUT_SECS = 60
+DEFAULT_LLM_RUN_TIMEOUT_SECS = 480
+DEFAULT_LLM_BREAKER_FAILURES = 5
+DEFAULT_LLM_STREAM = True
+DEFAULT_LLM_BATCH_SIZE = 1
+LLM_MODEL = "deepseek-chat"
+DEFAULT_DEEPSEEK_BASE_URL = "https://api.deepseek.com"
+LLM_TEMPERATURE = 0.7
 DEFAULT_MAX_AGE_DAYS = 3.0
 DEFAULT_ALLOW_UNDATED_NEWS = True
 DEFAULT_ALLOW_STALE_NEWS = False
 DEFAULT_ONLY_TODAY = False
 DEFAULT_SUMMARY_MAX_CHARS = 140
 DEFAULT_QUESTION_MAX_CHARS = 80
+DEFAULT_X_INTENT_MAX_CHARS = 280
+DEFAULT_STREAM_DRAFTS = True
+DEFAULT_STREAM_QUEUE_SIZE = 4
+DEFAULT_TELEGRAM_CHAT_MSGS_PER_MIN = 60
+DEFAULT_TELEGRAM_GLOBAL_MSGS_PER_SEC = 25
+DEFAULT_TELEGRAM_MAX_RETRIES = 5
+DEFAULT_PENDING_POSTS_TTL_HOURS = 168.0
+DEFAULT_PENDING_POSTS_MAX = 2000
+DEFAULT_DRAFTS_CACHE_SECS = 600
+DEFAULT_INCREMENTAL_MODE = False
+DEFAULT_NEAR_DUP_DEDUP = True
+DEFAULT_NEAR_DUP_THRESHOLD = 0.6
+_MINHASH_BINS = 32
+_MINHASH_BAND_ROWS = 4
 
 _NON_FOOTBALL_HINTS = [
     "baloncesto",
-    "basket",
+    "basket*",
     "nba",
     "acb",
     "euroliga",
@@ -108,15 +167,197 @@ _RSS_SOURCES = [
     {"name": "El Pais", "url": "https://feeds.elpais.com/mrss-s/pages/ep/site/elpais.com/section/deportes/portada"},
 ]
 
+# === Configuración de ejecución ===
+@dataclass(frozen=True)
+class RunConfig:
+    """Configuración de una ejecución, leída y validada una sola vez del entorno."""
+
+    max_drafts: int
+    target_real: int
+    target_barca: int
+    rss_timeout: int
+    rss_max_bytes: int
+    rss_read_deadline: int
+    rss_max_items_per_feed: int
+    rss_content_limit: int
+    rss_fetch_workers: int
+    rss_fetch_deadline: int
+    rss_http_cache: bool
+    rss_fast_parser: bool
+    http_max_per_host: int
+    max_age_days: float
+    only_today: bool
+    allow_undated_news: bool
+    allow_stale_news: bool
+    news_tz: Optional[tzinfo]
+    skip_processed_news: bool
+    processed_ttl_hours: float
+    near_dup_dedup: bool
+    near_dup_threshold: float
+    summary_max_chars: int
+    question_max_chars: int
+    llm_cache: bool
+    llm_cache_max_age_hours: float
+    llm_cache_max_mb: int
+    llm_max_concurrent: int
+    llm_max_rpm: int
+    llm_stream: bool
+    llm_batch_size: int
+    llm_timeout: int
+    llm_run_timeout: int
+    llm_max_retries: int
+    llm_breaker_failures: int
+    x_intent_max_chars: int
+    stream_drafts: bool
+    stream_queue_size: int
+    telegram_chat_msgs_per_min: int
+    telegram_global_msgs_per_sec: int
+    telegram_max_retries: int
+    pending_posts_ttl_hours: float
+    pending_posts_max: int
+    drafts_cache_secs: int
+    incremental_mode: bool
+    metrics_json_path: str
+    metrics_prom_path: str
+
+    @classmethod
+    def from_env(cls) -> "RunConfig":
+        max_drafts = _get_max_drafts()
+        target_real, target_barca = _get_club_targets(max_drafts)
+        return cls(
+            max_drafts=max_drafts,
+            target_real=target_real,
+            target_barca=target_barca,
+            rss_timeout=_get_rss_timeout(),
+            rss_max_bytes=_get_rss_max_mb() * 1024 * 1024,
+            rss_read_deadline=_get_rss_read_deadline(),
+            rss_max_items_per_feed=_get_rss_max_items_per_feed(),
+            rss_content_limit=_get_rss_content_limit(),
+            rss_fetch_workers=_get_rss_fetch_workers(),
+            rss_fetch_deadline=_get_rss_fetch_deadline(),
+            rss_http_cache=_rss_http_cache_enabled(),
+            rss_fast_parser=_rss_fast_parser_enabled(),
+            http_max_per_host=_get_http_max_per_host(),
+            max_age_days=_get_max_age_days(),
+            only_today=_only_today(),
+            allow_undated_news=_allow_undated_news(),
+            allow_stale_news=_allow_stale_news(),
+            news_tz=_get_news_timezone(),
+            skip_processed_news=_skip_processed_news(),
+            processed_ttl_hours=_get_processed_ttl_hours(),
+            near_dup_dedup=_near_dup_dedup_enabled(),
+            near_dup_threshold=_get_near_dup_threshold(),
+            summary_max_chars=_get_summary_max_chars(),
+            question_max_chars=_get_question_max_chars(),
+            llm_cache=_llm_cache_enabled(),
+            llm_cache_max_age_hours=_get_llm_cache_max_age_hours(),
+            llm_cache_max_mb=_get_llm_cache_max_mb(),
+            llm_max_concurrent=_get_llm_max_concurrent(),
+            llm_max_rpm=_get_llm_max_rpm(),
+            llm_stream=_llm_stream_enabled(),
+            llm_batch_size=_get_llm_batch_size(),
+            llm_timeout=_get_llm_timeout(),
+            llm_run_timeout=_get_llm_run_timeout(),
+            llm_max_retries=_get_llm_max_retries(),
+            llm_breaker_failures=_get_llm_breaker_failures(),
+            x_intent_max_chars=_get_x_intent_max_chars(),
+            stream_drafts=_stream_drafts_enabled(),
+            stream_queue_size=_get_stream_queue_size(),
+            telegram_chat_msgs_per_min=_get_telegram_chat_msgs_per_min(),
+            telegram_global_msgs_per_sec=_get_telegram_global_msgs_per_sec(),
+            telegram_max_retries=_get_telegram_max_retries(),
+            pending_posts_ttl_hours=_get_pending_posts_ttl_hours(),
+            pending_posts_max=_get_pending_posts_max(),
+            drafts_cache_secs=_get_drafts_cache_secs(),
+            incremental_mode=_incremental_mode_enabled(),
+            metrics_json_path=_get_metrics_path("METRICS_JSON_PATH"),
+            metrics_prom_path=_get_metrics_path("METRICS_PROM_PATH"),
+        )
+
+
 # === Búsqueda y filtrado de noticias ===
-def get_hot_macro_news():
+def get_hot_macro_news(config: Optional[RunConfig] = None):
+    config = config or RunConfig.from_env()
     print("[*] Escaneando RSS de futbol...")
-    results: list[dict] = []
-    for source in _RSS_SOURCES:
-        source_results = _fetch_rss_source(source)
-        results = _merge_results(results, source_results)
+    cache = _get_rss_cache(config)
+    if cache:
+        cache.reset_stats()
+    if config.rss_fetch_workers <= 1 or len(_RSS_SOURCES) <= 1:
+        # En secuencial el límite se comprueba entre feeds: el que está en
+        # curso lo acotan RSS_TIMEOUT_SECS y RSS_READ_DEADLINE_SECS.
+        deadline = time.monotonic() + config.rss_fetch_deadline
+        merged = _NewsIndex()
+        for index, source in enumerate(_RSS_SOURCES):
+            if time.monotonic() >= deadline:
+                skipped = [pending.get("name") or "RSS" for pending in _RSS_SOURCES[index:]]
+                print(f"[!] RSS sin respuesta antes del limite: {', '.join(skipped)}")
+                break
+            merged.add(_fetch_source_for_run(source, config))
+        results = merged.items
+    else:
+        results = _fetch_rss_sources_concurrently(_RSS_SOURCES, config)
+    if cache:
+        cache.save()
+        print(f"[*] Cache RSS: {cache.hits} sin cambios (304), {cache.misses} descargados.")
     return results
 
+
+def _fetch_rss_sources_concurrently(sources: list[dict], config: RunConfig) -> list[dict]:
+    # Los feeds se descargan en paralelo, pero se fusionan en el orden de
+    # _RSS_SOURCES: cada resultado espera a que terminen los de mayor prioridad.
+    # Los hilos son daemon (ThreadPoolExecutor los espera al salir del
+    # intérprete): una descarga que sigue tras el límite no alarga el proceso.
+    deadline = time.monotonic() + config.rss_fetch_deadline
+    slots: list[Optional[list[dict]]] = [None] * len(sources)
+    next_index = 0
+    merged = _NewsIndex()
+    todo: "queue.Queue[int]" = queue.Queue()
+    for index in range(len(sources)):
+        todo.put(index)
+    done: "queue.Queue[tuple[int, list[dict]]]" = queue.Queue()
+    cancelled = threading.Event()
+
+    def worker() -> None:
+        while not cancelled.is_set():
+            try:
+                index = todo.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                items = _fetch_source_for_run(sources[index], config)
+            except Exception as exc:
+                if not cancelled.is_set():
+                    print(f"[!] RSS error ({sources[index].get('name') or 'RSS'}): {exc}")
+                items = []
+            done.put((index, items))
+
+    for _ in range(min(config.rss_fetch_workers, len(sources))):
+        threading.Thread(target=worker, daemon=True).start()
+    try:
+        for _ in range(len(sources)):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                index, items = done.get(timeout=remaining)
+            except queue.Empty:
+                break
+            slots[index] = items
+            while next_index < len(sources) and slots[next_index] is not None:
+                merged.add(slots[next_index] or [])
+                next_index += 1
+    finally:
+        cancelled.set()
+
+    skipped = [sources[index].get("name") or "RSS" for index in range(len(sources)) if slots[index] is None]
+    if skipped:
+        print(f"[!] RSS sin respuesta antes del limite: {', '.join(skipped)}")
+    for index in range(next_index, len(sources)):
+        if slots[index]:
+            merged.add(slots[index] or [])
+    return merged.items
+
+
 _REAL_TOKENS = [
     "real madrid",
     "realmadrid",
@@ -126,16 +367,20 @@ _REAL_TOKENS = [
     "santiago bernabéu",
     "los blancos",
     "merengue",
+    "merengues",
 ]
 
 _BARCA_TOKENS = [
     "fc barcelona",
+    "fcbarcelona",
     "barcelona",
     "barça",
     "barca",
     "fcb",
     "blaugrana",
+    "blaugranas",
     "culé",
+    "culés",
     "camp nou",
     "nou camp",
 ]
@@ -214,6 +459,59 @@ def _get_question_max_chars() -> int:
     return DEFAULT_QUESTION_MAX_CHARS
 
 
+def _get_x_intent_max_chars() -> int:
+    value = _get_env_int("X_INTENT_MAX_CHARS")
+    if value and value > 0:
+        return value
+    return DEFAULT_X_INTENT_MAX_CHARS
+
+
+def _get_telegram_chat_msgs_per_min() -> int:
+    value = _get_env_int("TELEGRAM_CHAT_MSGS_PER_MIN")
+    if value and value > 0:
+        return value
+    return DEFAULT_TELEGRAM_CHAT_MSGS_PER_MIN
+
+
+def _get_telegram_global_msgs_per_sec() -> int:
+    value = _get_env_int("TELEGRAM_GLOBAL_MSGS_PER_SEC")
+    if value and value > 0:
+        return value
+    return DEFAULT_TELEGRAM_GLOBAL_MSGS_PER_SEC
+
+
+def _get_telegram_max_retries() -> int:
+    value = _get_env_int("TELEGRAM_MAX_RETRIES")
+    if value is not None:
+        return value
+    return DEFAULT_TELEGRAM_MAX_RETRIES
+
+
+def _get_pending_posts_ttl_hours() -> float:
+    raw = (os.getenv("PENDING_POSTS_TTL_HOURS") or "").strip()
+    if not raw:
+        return DEFAULT_PENDING_POSTS_TTL_HOURS
+    try:
+        value = float(raw)
+    except ValueError:
+        return DEFAULT_PENDING_POSTS_TTL_HOURS
+    return value if value > 0 else DEFAULT_PENDING_POSTS_TTL_HOURS
+
+
+def _get_pending_posts_max() -> int:
+    value = _get_env_int("PENDING_POSTS_MAX")
+    if value and value > 0:
+        return value
+    return DEFAULT_PENDING_POSTS_MAX
+
+
+def _get_drafts_cache_secs() -> int:
+    value = _get_env_int("DRAFTS_CACHE_SECS")
+    if value is not None:
+        return value
+    return DEFAULT_DRAFTS_CACHE_SECS
+
+
 def _get_max_drafts() -> int:
     value = _get_env_int("MAX_DRAFTS")
     if value and value > 0:
@@ -255,6 +553,20 @@ def _get_rss_timeout() -> int:
     return DEFAULT_RSS_TIMEOUT
 
 
+def _get_rss_max_mb() -> int:
+    value = _get_env_int("RSS_MAX_MB")
+    if value is not None:
+        return value
+    return DEFAULT_RSS_MAX_MB
+
+
+def _get_rss_read_deadline() -> int:
+    value = _get_env_int("RSS_READ_DEADLINE_SECS")
+    if value is not None:
+        return value
+    return DEFAULT_RSS_READ_DEADLINE
+
+
 def _get_rss_max_items_per_feed() -> int:
     raw = (os.getenv("RSS_MAX_ITEMS_PER_FEED") or "").strip()
     if raw.isdigit():
@@ -264,6 +576,69 @@ def _get_rss_max_items_per_feed() -> int:
     return DEFAULT_RSS_MAX_ITEMS_PER_FEED
 
 
+def _get_rss_fetch_workers() -> int:
+    value = _get_env_int("RSS_FETCH_WORKERS")
+    if value is not None and value > 0:
+        return value
+    return DEFAULT_RSS_FETCH_WORKERS
+
+
+def _get_rss_fetch_deadline() -> int:
+    value = _get_env_int("RSS_FETCH_DEADLINE_SECS")
+    if value and value > 0:
+        return value
+    return DEFAULT_RSS_FETCH_DEADLINE
+
+
+def _rss_http_cache_enabled() -> bool:
+    raw = (os.getenv("RSS_HTTP_CACHE") or "").strip()
+    if raw == "":
+        return DEFAULT_RSS_HTTP_CACHE
+    return raw == "1"
+
+
+def _rss_fast_parser_enabled() -> bool:
+    raw = (os.getenv("RSS_FAST_PARSER") or "").strip()
+    if raw == "":
+        return DEFAULT_RSS_FAST_PARSER
+    return raw == "1"
+
+
+def _get_http_max_per_host() -> int:
+    value = _get_env_int("HTTP_MAX_CONNECTIONS_PER_HOST")
+    if value and value > 0:
+        return value
+    return DEFAULT_HTTP_MAX_PER_HOST
+
+
+_http_client: Optional[HttpClient] = None
+_http_client_lock = threading.Lock()
+
+
+def _get_http_client(config: RunConfig) -> HttpClient:
+    """Cliente HTTP del proceso: las conexiones abiertas se reutilizan entre
+    feeds y, en el controlador de Telegram, entre ejecuciones."""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = HttpClient(config.http_max_per_host)
+        return _http_client
+
+
+_rss_cache: Optional[FeedValidatorCache] = None
+_rss_cache_lock = threading.Lock()
+
+
+def _get_rss_cache(config: RunConfig) -> Optional[FeedValidatorCache]:
+    global _rss_cache
+    if not config.rss_http_cache:
+        return None
+    with _rss_cache_lock:
+        if _rss_cache is None:
+            _rss_cache = FeedValidatorCache(os.path.join(get_cache_dir(), "rss_validators.json"))
+        return _rss_cache
+
+
 def _get_rss_content_limit() -> int:
     raw = (os.getenv("RSS_CONTENT_LIMIT") or "").strip()
     if raw.isdigit():
@@ -273,18 +648,72 @@ def _get_rss_content_limit() -> int:
     return DEFAULT_RSS_CONTENT_LIMIT
 
 
-def _strip_html(text: str) -> str:
-    if not text:
-        return ""
-    cleaned = re.sub(r"<[^>]+>", " ", text)
-    return html.unescape(cleaned)
-
-
-def _compact_spaces(text: str) -> str:
-    return " ".join((text or "").split()).strip()
+_HTML_SPACE_RE = re.compile(r"[ \t\n]")
+_HTML_TEXT_WINDOW = 2048
 
 
-def _extract_entry_text(entry: dict) -> str:
+def _html_text_runs(raw: str) -> Iterator[str]:
+    # Texto entre etiquetas (lo que casaría "<[^>]+>"); un "<" suelto no
+    # separa palabras.
+    parts: list[str] = []
+    pos = 0
+    has_close = True
+    while pos < len(raw):
+        start = raw.find("<", pos) if has_close else -1
+        if start < 0:
+            parts.append(raw[pos:])
+            break
+        close = raw.find(">", start + 1)
+        if close < 0:
+            has_close = False
+        if close <= start + 1:
+            parts.append(raw[pos:start + 1])
+            pos = start + 1
+            continue
+        if start > pos:
+            parts.append(raw[pos:start])
+        if parts:
+            yield "".join(parts)
+            parts = []
+        pos = close + 1
+    if parts:
+        yield "".join(parts)
+
+
+def _html_to_text(raw: str, max_chars: int = 0) -> str:
+    """Texto plano de un fragmento HTML (sin etiquetas, entidades resueltas y
+    espacios compactados) en una sola pasada.
+
+    Con `max_chars` se detiene en cuanto el texto pasa de ese tamaño (la
+    palabra que lo rebasa se incluye, para poder cortar por palabra), así que
+    el trabajo depende del límite y no del tamaño del HTML.
+    """
+    words: list[str] = []
+    length = -1
+    for run in _html_text_runs(raw or ""):
+        # Los textos largos se procesan por ventanas cortadas en un espacio
+        # (nunca dentro de una palabra o entidad), para no desescapar de
+        # golpe un artículo entero.
+        start = 0
+        while start < len(run):
+            end = start + _HTML_TEXT_WINDOW
+            if end < len(run):
+                cut = max(run.rfind(space, start, end) for space in " \n\t")
+                if cut > start:
+                    end = cut
+                else:
+                    space = _HTML_SPACE_RE.search(run, end)
+                    end = space.start() if space else len(run)
+            for word in html.unescape(run[start:end]).split():
+                words.append(word)
+                length += len(word) + 1
+                if max_chars > 0 and length > max_chars:
+                    return " ".join(words)
+            start = end
+    return " ".join(words)
+
+
+def _entry_text_parts(entry: dict) -> list[str]:
     summary = (entry.get("summary") or entry.get("description") or "").strip()
     summary_detail = ""
     detail = entry.get("summary_detail") or {}
@@ -294,11 +723,33 @@ def _extract_entry_text(entry: dict) -> str:
     contents = entry.get("content") or []
     if contents:
         content_value = (contents[0].get("value") or "").strip()
-    raw_text = " ".join(
-        part for part in [summary, summary_detail, content_value] if part
-    ).strip()
-    cleaned = _compact_spaces(_strip_html(raw_text))
-    limit = _get_rss_content_limit()
+    parts: list[str] = []
+    for part in (summary, summary_detail, content_value):
+        if part and part not in parts:
+            parts.append(part)
+    return parts
+
+
+def _is_word_prefix(prefix: str, text: str) -> bool:
+    return text == prefix or text.startswith(prefix + " ")
+
+
+def _extract_entry_text(entry: dict, limit: int) -> str:
+    # summary y summary_detail suelen ser el mismo texto, y content:encoded
+    # muchas veces empieza por el resumen: un texto cuyas palabras son las
+    # primeras de otro no se repite ("Real" no se descarta ante "Realmente").
+    texts: list[str] = []
+    for part in _entry_text_parts(entry):
+        text = _html_to_text(part, limit)
+        if not text or any(_is_word_prefix(text, previous) for previous in texts):
+            continue
+        for index, previous in enumerate(texts):
+            if _is_word_prefix(previous, text):
+                texts[index] = text
+                break
+        else:
+            texts.append(text)
+    cleaned = " ".join(dict.fromkeys(texts))
     if limit > 0 and len(cleaned) > limit:
         trimmed = cleaned[:limit].rsplit(" ", 1)[0].strip()
         return trimmed or cleaned[:limit]
@@ -316,65 +767,230 @@ def _extract_entry_timestamp(entry: dict) -> float:
     return 0.0
 
 
-def _entry_to_item(entry: dict, source_name: str) -> Optional[dict]:
+def _entry_to_item(entry: dict, source_name: str, content_limit: int) -> Optional[dict]:
     title = (entry.get("title") or "").strip()
     url = _pick_entry_url(entry)
     if not title or not url:
         return None
-    content = _extract_entry_text(entry)
+    content = _extract_entry_text(entry, content_limit)
     return {
         "title": title,
         "content": content,
         "url": url,
         "source": source_name,
         "published_ts": _extract_entry_timestamp(entry),
+        "guid": (entry.get("id") or entry.get("guid") or url).strip(),
     }
 
 
-def _fetch_rss_source(source: dict) -> list[dict]:
+def _stale_cutoff_ts(config: RunConfig) -> Optional[float]:
+    """Fecha por debajo de la cual select_diverse_news descartará seguro una
+    noticia fechada, o None si no descarta ninguna por antigüedad."""
+    if config.only_today:
+        now = datetime.now(config.news_tz or timezone.utc)
+        return now.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    if config.max_age_days > 0 and not config.allow_stale_news:
+        return time.time() - (config.max_age_days * 86400)
+    return None
+
+
+def _parse_feed_entries(content: bytes, source_name: str, config: RunConfig) -> list:
+    """RSS 2.0/Atom bien formado por el parser rápido; el resto, por feedparser.
+
+    El parser rápido deja de leer al llegar a RSS_MAX_ITEMS_PER_FEED entradas
+    o a noticias que la selección descartaría por antiguas.
+    """
+    metrics = run_metrics.current()
+    if config.rss_fast_parser:
+        stats = feed_parser.ParseStats()
+        try:
+            with metrics.timer("feed_parse_seconds", source=source_name, parser="fast"):
+                entries = feed_parser.parse_entries(
+                    content,
+                    max_entries=config.rss_max_items_per_feed,
+                    min_timestamp=_stale_cutoff_ts(config),
+                    stats=stats,
+                )
+        except feed_parser.FastFeedError as exc:
+            metrics.inc("feed_parse_fallbacks", source=source_name)
+            print(f"[*] RSS {source_name}: se usa feedparser ({exc}).")
+        else:
+            if stats.skipped_old:
+                metrics.inc("feed_entries_skipped_old", stats.skipped_old, source=source_name)
+            if stats.stopped_early:
+                metrics.inc("feed_parse_early_stops", source=source_name)
+            return entries
+    with metrics.timer("feed_parse_seconds", source=source_name, parser="feedparser"):
+        return feedparser.parse(content).entries or []
+
+
+def _fetch_rss_source(source: dict, config: Optional[RunConfig] = None) -> list[dict]:
+    config = config or RunConfig.from_env()
     url = (source.get("url") or "").strip()
     name = source.get("name") or "RSS"
     if not url:
         return []
+    cache = _get_rss_cache(config)
+    metrics = run_metrics.current()
+    headers = cache.request_headers(url) if cache else {}
     try:
-        response = requests.get(
-            url,
-            timeout=_get_rss_timeout(),
-            headers={"User-Agent": "Mozilla/5.0 (compatible; ai_posts/1.0)"},
-        )
+        with metrics.timer("rss_fetch_seconds", source=name):
+            response, body = _get_http_client(config).download(
+                url,
+                timeout=config.rss_timeout,
+                headers=headers,
+                max_bytes=config.rss_max_bytes,
+                deadline_secs=config.rss_read_deadline,
+            )
+        metrics.inc("rss_responses", source=name, status=response.status_code)
         response.raise_for_status()
+    except DownloadAborted as exc:
+        metrics.inc("rss_abandoned", source=name, reason=exc.reason)
+        print(f"[!] RSS descartado ({name}): {exc}")
+        return []
     except Exception as exc:
+        if not isinstance(exc, requests.exceptions.HTTPError):
+            metrics.inc("rss_responses", source=name, status="error")
         print(f"[!] RSS error ({name}): {exc}")
         return []
 
-    feed = feedparser.parse(response.content)
-    entries = feed.entries or []
-    max_items = _get_rss_max_items_per_feed()
+    if response.status_code == 304 and cache:
+        cached_items = cache.cached_items(url)
+        cached_items = cached_items if cached_items is not None else []
+        metrics.set("rss_items", len(cached_items), source=name)
+        return cached_items
+
+    metrics.inc("rss_bytes", len(body), source=name)
+    entries = _parse_feed_entries(body, name, config)
+    max_items = config.rss_max_items_per_feed
     if max_items > 0:
         entries = entries[:max_items]
 
     results: list[dict] = []
     for entry in entries:
-        item = _entry_to_item(entry, name)
+        item = _entry_to_item(entry, name, config.rss_content_limit)
         if item:
             results.append(item)
+    metrics.set("rss_items", len(results), source=name)
+    if cache:
+        cache.store(
+            url,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+            results,
+        )
     return results
 
 
-def _merge_results(primary: list[dict], secondary: list[dict]) -> list[dict]:
-    if not secondary:
-        return primary
-    merged: list[dict] = []
-    seen: set[str] = set()
-    for item in primary + secondary:
-        url = (item.get("url") or "").strip().lower()
-        key = url or (item.get("title") or "").strip().lower()
-        if key:
-            if key in seen:
-                continue
-            seen.add(key)
-        merged.append(item)
-    return merged
+def _incremental_mode_enabled() -> bool:
+    raw = (os.getenv("INCREMENTAL_MODE") or "").strip()
+    if raw == "":
+        return DEFAULT_INCREMENTAL_MODE
+    return raw == "1"
+
+
+def _get_metrics_path(name: str) -> str:
+    """Ruta del informe de métricas; vacía si no se quiere escribir."""
+    return (os.getenv(name) or "").strip()
+
+
+_watermark_store: Optional[WatermarkStore] = None
+_watermark_store_lock = threading.Lock()
+
+
+def _get_watermark_store(config: RunConfig) -> Optional[WatermarkStore]:
+    global _watermark_store
+    if not config.incremental_mode:
+        return None
+    with _watermark_store_lock:
+        if _watermark_store is None:
+            _watermark_store = WatermarkStore(os.path.join(get_cache_dir(), "rss_watermarks.json"))
+        return _watermark_store
+
+
+def _fetch_source_for_run(source: dict, config: RunConfig) -> list[dict]:
+    items = _fetch_rss_source(source, config)
+    watermarks = _get_watermark_store(config)
+    if not watermarks or not items:
+        return items
+
+    # Modo incremental: solo pasan las noticias más nuevas que la marca del
+    # feed (las que no tienen fecha no se pueden ordenar y siguen pasando) y
+    # las seleccionadas en otra ejecución que no llegaron a entregarse. La
+    # marca avanza en mark_draft_delivered, con cada borrador entregado.
+    source_key = (source.get("url") or "").strip()
+    mark = watermarks.get(source_key) or {}
+    mark_ts = float(mark.get("published_ts") or 0.0)
+    mark_guid = mark.get("guid") or ""
+    pending = set(mark.get("pending") or [])
+    if pending:
+        watermarks.prune(source_key, {_watermark_guid(item) for item in items})
+    fresh: list[dict] = []
+    for item in items:
+        published_ts = float(item.get("published_ts") or 0.0)
+        guid = _watermark_guid(item)
+        below_mark = published_ts < mark_ts or (published_ts == mark_ts and guid == mark_guid)
+        if published_ts and below_mark and guid not in pending:
+            continue
+        item["feed_key"] = source_key
+        fresh.append(item)
+    return fresh
+
+
+def _watermark_guid(item: dict) -> str:
+    return item.get("guid") or item.get("url") or ""
+
+
+_TRACKING_PARAM_PREFIXES = ("utm_", "ns_", "mc_", "at_")
+_TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "igshid", "ref", "ref_src", "cmpid", "int", "ito"}
+
+
+def _normalize_url(url: str) -> str:
+    cleaned = (url or "").strip()
+    if not cleaned:
+        return ""
+    try:
+        parts = urlsplit(cleaned)
+    except ValueError:
+        return cleaned.lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/")
+    query = [
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in _TRACKING_PARAMS
+        and not name.lower().startswith(_TRACKING_PARAM_PREFIXES)
+    ]
+    normalized = f"{host}{path}".lower()
+    if query:
+        normalized += "?" + urlencode(sorted(query))
+    return normalized
+
+
+def _dedup_key(item: dict) -> str:
+    return _normalize_url(item.get("url") or "") or (item.get("title") or "").strip().lower()
+
+
+class _NewsIndex:
+    """Fusión incremental de resultados: conserva el orden de llegada y un
+    índice de claves vistas, así que cada item se procesa una sola vez."""
+
+    def __init__(self):
+        self.items: list[dict] = []
+        self._seen: set[str] = set()
+
+    def add(self, items: list[dict]) -> None:
+        for item in items:
+            key = _dedup_key(item)
+            if key:
+                if key in self._seen:
+                    continue
+                self._seen.add(key)
+            self.items.append(item)
 
 
 def _get_max_age_days() -> float:
@@ -395,7 +1011,7 @@ def _only_today() -> bool:
     return raw == "1"
 
 
-def _get_news_timezone() -> Optional[datetime.tzinfo]:
+def _get_news_timezone() -> Optional[tzinfo]:
     tz_name = (os.getenv("NEWS_TZ") or os.getenv("RUN_TZ") or "UTC").strip() or "UTC"
     if ZoneInfo is None:
         return None
@@ -405,12 +1021,11 @@ def _get_news_timezone() -> Optional[datetime.tzinfo]:
         return ZoneInfo("UTC")
 
 
-def _is_today(published_ts: float) -> bool:
+def _is_today(published_ts: float, news_tz: Optional[tzinfo]) -> bool:
     if not published_ts:
         return False
-    tzinfo = _get_news_timezone()
-    if tzinfo:
-        return datetime.fromtimestamp(published_ts, tz=tzinfo).date() == datetime.now(tzinfo).date()
+    if news_tz:
+        return datetime.fromtimestamp(published_ts, tz=news_tz).date() == datetime.now(news_tz).date()
     return datetime.utcfromtimestamp(published_ts).date() == datetime.utcnow().date()
 
 
@@ -428,6 +1043,45 @@ def _allow_stale_news() -> bool:
     return raw == "1"
 
 
+def _skip_processed_news() -> bool:
+    raw = (os.getenv("SKIP_PROCESSED_NEWS") or "").strip()
+    if raw == "":
+        return DEFAULT_SKIP_PROCESSED_NEWS
+    return raw == "1"
+
+
+def _get_processed_ttl_hours() -> float:
+    raw = (os.getenv("PROCESSED_TTL_HOURS") or "").strip()
+    if not raw:
+        return DEFAULT_PROCESSED_TTL_HOURS
+    try:
+        value = float(raw)
+    except ValueError:
+        return DEFAULT_PROCESSED_TTL_HOURS
+    return value if value > 0 else DEFAULT_PROCESSED_TTL_HOURS
+
+
+_processed_store: Optional[ProcessedNewsStore] = None
+_processed_store_lock = threading.Lock()
+
+
+def _get_processed_store(config: RunConfig) -> Optional[ProcessedNewsStore]:
+    global _processed_store
+    if not config.skip_processed_news:
+        return None
+    with _processed_store_lock:
+        if _processed_store is None:
+            _processed_store = ProcessedNewsStore(
+                os.path.join(get_cache_dir(), "processed_news.sqlite3"),
+                config.processed_ttl_hours * 3600,
+            )
+        return _processed_store
+
+
+def _news_key(item: dict) -> str:
+    return _dedup_key(item)
+
+
 def _priority_rank(item: dict) -> int:
     domain = _extract_domain(item.get("url", ""))
     for idx, priority in enumerate(_PRIORITY_SOURCES):
@@ -443,16 +1097,69 @@ def _is_allowed_source(item: dict) -> bool:
     return any(_domain_matches(domain, allowed) for allowed in _ALLOWED_SOURCES)
 
 
+def _fold_text(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class _TokenMatcher:
+    """Una sola regex compilada para todas las listas de tokens: busca en
+    texto sin acentos y exige límites de palabra ("barca" no casa con
+    "embarcación" ni "fcb" con "fcbayern"). Un token acabado en "*" acepta
+    cualquier final ("basket*" casa con "basketball"); las listas de
+    `substring_labels` casan en cualquier posición."""
+
+    def __init__(self, token_sets: dict[str, list[str]], substring_labels: frozenset[str] = frozenset()):
+        self._labels: dict[str, str] = {}
+        groups: list[str] = []
+        for index, (label, tokens) in enumerate(token_sets.items()):
+            folded = sorted({_fold_text(token) for token in tokens if token}, key=len, reverse=True)
+            if not folded:
+                continue
+            group = f"g{index}"
+            self._labels[group] = label
+            if label in substring_labels:
+                alternatives = [re.escape(token.rstrip("*")) for token in folded]
+                boundary = ""
+            else:
+                alternatives = [
+                    re.escape(token[:-1]) if token.endswith("*") else re.escape(token) + r"(?![a-z0-9])"
+                    for token in folded
+                ]
+                boundary = r"(?<![a-z0-9])"
+            groups.append(f"(?P<{group}>{boundary}(?:{'|'.join(alternatives)}))")
+        self._pattern = re.compile("|".join(groups))
+
+    def hits(self, text: str) -> list[tuple[str, str]]:
+        if not text:
+            return []
+        return [
+            (self._labels[match.lastgroup], match.group())
+            for match in self._pattern.finditer(_fold_text(text))
+        ]
+
+    def labels(self, text: str) -> set[str]:
+        return {label for label, _ in self.hits(text)}
+
+
+_TEXT_MATCHER = _TokenMatcher(
+    {
+        "real": _REAL_TOKENS,
+        "barca": _BARCA_TOKENS,
+        "non_football": _NON_FOOTBALL_HINTS,
+        "blocked_url": _BLOCKED_URL_CONTAINS,
+    },
+    substring_labels=frozenset({"blocked_url"}),
+)
+_CLUB_LABELS = {"real", "barca"}
+
+
 def _is_non_football_context(url: str, text: str) -> bool:
-    haystack = f"{url} {text}".lower()
-    return any(hint in haystack for hint in _NON_FOOTBALL_HINTS)
+    return "non_football" in _TEXT_MATCHER.labels(f"{url} {text}")
 
 
 def _is_blocked_url(url: str) -> bool:
-    cleaned = (url or "").lower()
-    if not cleaned:
-        return False
-    return any(token in cleaned for token in _BLOCKED_URL_CONTAINS)
+    return "blocked_url" in _TEXT_MATCHER.labels(url)
 
 
 def _is_section_like_url(url: str) -> bool:
@@ -496,12 +1203,7 @@ def _extract_published_timestamp(item: dict) -> float:
 
 
 def _detect_clubs(text: str) -> set[str]:
-    clubs = set()
-    if any(token in text for token in _REAL_TOKENS):
-        clubs.add("real")
-    if any(token in text for token in _BARCA_TOKENS):
-        clubs.add("barca")
-    return clubs
+    return _TEXT_MATCHER.labels(text) & _CLUB_LABELS
 
 
 def _extract_keywords(text: str, limit: int = 8) -> list[str]:
@@ -539,6 +1241,25 @@ def _extract_question_line(text: str) -> str:
     return ""
 
 
+def _partial_question_fails(partial_text: str, title: str, content: str) -> bool:
+    """Decide con una respuesta aún incompleta si la pregunta ya no vale:
+    o la línea de pregunta está terminada y no pasa `_question_needs_regen`,
+    o lo que va escrito de ella ya empieza como una muletilla prohibida."""
+    if "###" not in partial_text:
+        return False
+    body = partial_text.split("###", 1)[1]
+    lines = body.split("\n")
+    for index, raw_line in enumerate(lines):
+        line = raw_line.strip()
+        if not line or line.lower().startswith("fuente:") or line.startswith("#"):
+            continue
+        if index < len(lines) - 1:
+            return _question_needs_regen(line, title, content)
+        lower = line.lower()
+        return any(lower.startswith(start) for start in _BAD_QUESTION_STARTS)
+    return False
+
+
 def _question_needs_regen(question: str, title: str, content: str) -> bool:
     if not question:
         return True
@@ -555,6 +1276,103 @@ def _question_needs_regen(question: str, title: str, content: str) -> bool:
     return False
 
 
+def _near_dup_dedup_enabled() -> bool:
+    raw = (os.getenv("NEAR_DUP_DEDUP") or "").strip()
+    if raw == "":
+        return DEFAULT_NEAR_DUP_DEDUP
+    return raw == "1"
+
+
+def _get_near_dup_threshold() -> float:
+    raw = (os.getenv("NEAR_DUP_THRESHOLD") or "").strip()
+    if not raw:
+        return DEFAULT_NEAR_DUP_THRESHOLD
+    try:
+        value = float(raw)
+    except ValueError:
+        return DEFAULT_NEAR_DUP_THRESHOLD
+    return value if 0 < value <= 1 else DEFAULT_NEAR_DUP_THRESHOLD
+
+
+def _minhash_signature(text: str) -> Optional[tuple]:
+    # MinHash de una sola permutación: un hash por palabra, repartido en
+    # _MINHASH_BINS cubetas; las vacías se rellenan con la siguiente llena.
+    # hash() cambia entre procesos, pero las firmas solo se comparan dentro
+    # de la misma ejecución.
+    words = {
+        word
+        for word in re.findall(r"\w+", (text or "").lower())
+        if len(word) > 2 and word not in _STOPWORDS
+    }
+    if not words:
+        return None
+    bins: list[Optional[int]] = [None] * _MINHASH_BINS
+    for word in words:
+        digest = hash(word) & 0xFFFFFFFFFFFFFFFF
+        index = digest % _MINHASH_BINS
+        value = digest // _MINHASH_BINS
+        current = bins[index]
+        if current is None or value < current:
+            bins[index] = value
+    signature = []
+    for index in range(_MINHASH_BINS):
+        for offset in range(_MINHASH_BINS):
+            value = bins[(index + offset) % _MINHASH_BINS]
+            if value is not None:
+                signature.append((value, offset))
+                break
+    return tuple(signature)
+
+
+def _cluster_near_duplicates(candidates: list[dict], threshold: float) -> list[dict]:
+    # LSH por bandas sobre la firma MinHash: solo se comparan pares que
+    # coinciden en alguna banda, y se unen si su Jaccard estimado >= threshold.
+    # Cada representante se queda en "cluster_keys" con las claves de todo su grupo.
+    if len(candidates) < 2:
+        return candidates
+    signatures = [
+        _minhash_signature(f"{candidate['item'].get('title') or ''} {candidate['item'].get('content') or ''}")
+        for candidate in candidates
+    ]
+    parent = list(range(len(candidates)))
+
+    def find(index: int) -> int:
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    min_matches = threshold * _MINHASH_BINS
+    buckets: dict[tuple, list[int]] = {}
+    for index, signature in enumerate(signatures):
+        if signature is None:
+            continue
+        for start in range(0, _MINHASH_BINS, _MINHASH_BAND_ROWS):
+            bucket = buckets.setdefault((start, signature[start:start + _MINHASH_BAND_ROWS]), [])
+            for other in bucket:
+                if find(other) == find(index):
+                    continue
+                matches = sum(1 for a, b in zip(signature, signatures[other]) if a == b)
+                if matches >= min_matches:
+                    parent[find(index)] = find(other)
+            bucket.append(index)
+
+    representatives: dict[int, int] = {}
+    for index, candidate in enumerate(candidates):
+        root = find(index)
+        best = representatives.get(root)
+        if best is None or (candidate["priority"], -candidate["published_ts"]) < (
+            candidates[best]["priority"],
+            -candidates[best]["published_ts"],
+        ):
+            representatives[root] = index
+    for index, candidate in enumerate(candidates):
+        representative = candidates[representatives[find(index)]]
+        representative.setdefault("cluster_keys", set()).add(candidate["key"])
+    keep = set(representatives.values())
+    return [candidate for index, candidate in enumerate(candidates) if index in keep]
+
+
 def _club_label_from_set(clubs: set[str]) -> Optional[str]:
     if clubs == {"real"}:
         return "real"
@@ -563,66 +1381,103 @@ def _club_label_from_set(clubs: set[str]) -> Optional[str]:
     return None
 
 
-def select_diverse_news(news_results):
-    max_drafts = _get_max_drafts()
-    if max_drafts < 1 or not news_results:
+def select_diverse_news(
+    news_results,
+    skip_keys: Optional[set[str]] = None,
+    config: Optional[RunConfig] = None,
+):
+    config = config or RunConfig.from_env()
+    if config.max_drafts < 1 or not news_results:
         return []
-    target_real, target_barca = _get_club_targets(max_drafts)
+    target_real, target_barca = config.target_real, config.target_barca
     total_target = target_real + target_barca
     if total_target < 1:
         return []
 
-    only_today = _only_today()
-    allow_undated = _allow_undated_news()
-    allow_stale = _allow_stale_news()
+    only_today = config.only_today
+    allow_undated = config.allow_undated_news
+    allow_stale = config.allow_stale_news
     cutoff_ts = None
-    if not only_today:
-        max_age_days = _get_max_age_days()
-        if max_age_days > 0:
-            cutoff_ts = time.time() - (max_age_days * 86400)
+    if not only_today and config.max_age_days > 0:
+        cutoff_ts = time.time() - (config.max_age_days * 86400)
+
+    metrics = run_metrics.current()
+    metrics.set("select_input_items", len(news_results))
+
+    def drop(reason: str) -> None:
+        metrics.inc("select_dropped", reason=reason)
 
     candidates: list[dict] = []
     for item in news_results:
         if not _is_allowed_source(item):
+            drop("source_not_allowed")
             continue
 
         title = (item.get("title") or "").strip()
         url = (item.get("url") or "").strip()
         content = (item.get("content") or "").strip()
-        title_url_text = f"{title} {url}".strip().lower()
-        detection_text = f"{title} {url} {content}".strip().lower()
-        clubs = _detect_clubs(detection_text)
+        # Un único barrido por campo: las etiquetas de URL y título deciden los
+        # filtros de contexto, y las de los tres campos los clubes.
+        url_labels = _TEXT_MATCHER.labels(url)
+        title_labels = _TEXT_MATCHER.labels(title)
+        content_labels = _TEXT_MATCHER.labels(content)
+        clubs = (url_labels | title_labels | content_labels) & _CLUB_LABELS
         if not clubs:
+            drop("no_club")
             continue
-        if _is_blocked_url(url):
+        if "blocked_url" in url_labels:
+            drop("blocked_url")
             continue
-        if _is_non_football_context(url, title_url_text):
+        if "non_football" in url_labels or "non_football" in title_labels:
+            drop("non_football")
             continue
         if _is_section_like_url(url):
+            drop("section_url")
             continue
 
         published_ts = _extract_published_timestamp(item)
         if not published_ts:
             if only_today or not allow_undated:
+                drop("undated")
                 continue
-        if published_ts and only_today and not _is_today(published_ts):
+        if published_ts and only_today and not _is_today(published_ts, config.news_tz):
+            drop("not_today")
             continue
         if not only_today and published_ts and cutoff_ts is not None and published_ts < cutoff_ts:
             if not allow_stale:
+                drop("stale")
                 continue
 
-        key = (url or title).strip().lower()
         candidates.append(
             {
                 "item": item,
                 "priority": _priority_rank(item),
                 "published_ts": published_ts or 0.0,
                 "clubs": clubs,
-                "key": key,
+                "key": _news_key(item),
             }
         )
 
+    if config.near_dup_dedup:
+        clustered = _cluster_near_duplicates(candidates, config.near_dup_threshold)
+        if len(clustered) < len(candidates):
+            metrics.inc("select_dropped", len(candidates) - len(clustered), reason="near_duplicate")
+        candidates = clustered
+
+    # Una noticia ya redactada descarta todo su grupo: el resto de medios que
+    # la publican no deben redactarse en ejecuciones posteriores.
+    fresh: list[dict] = []
+    for candidate in candidates:
+        cluster_keys = candidate.setdefault("cluster_keys", {candidate["key"]})
+        if skip_keys and not skip_keys.isdisjoint(cluster_keys):
+            drop("already_processed")
+            continue
+        candidate["item"]["news_keys"] = sorted(cluster_keys)
+        fresh.append(candidate)
+    candidates = fresh
+
     if not candidates:
+        metrics.set("select_output_items", 0)
         return []
 
     candidates.sort(
@@ -681,34 +1536,350 @@ def select_diverse_news(news_results):
         if real_count >= target_real and barca_count >= target_barca:
             break
 
+    metrics.set("select_candidates", len(candidates))
+    metrics.set("select_output_items", len(selected))
     return [candidate["item"] for candidate in selected]
 
 
 # === Generación de contenido ===
-def generate_expert_post(
+def _llm_cache_enabled() -> bool:
+    raw = (os.getenv("LLM_CACHE") or "").strip()
+    if raw == "":
+        return DEFAULT_LLM_CACHE
+    return raw == "1"
+
+
+def _get_llm_cache_max_age_hours() -> float:
+    raw = (os.getenv("LLM_CACHE_MAX_AGE_HOURS") or "").strip()
+    if not raw:
+        return DEFAULT_LLM_CACHE_MAX_AGE_HOURS
+    try:
+        value = float(raw)
+    except ValueError:
+        return DEFAULT_LLM_CACHE_MAX_AGE_HOURS
+    return value if value > 0 else DEFAULT_LLM_CACHE_MAX_AGE_HOURS
+
+
+def _get_llm_cache_max_mb() -> int:
+    value = _get_env_int("LLM_CACHE_MAX_MB")
+    if value and value > 0:
+        return value
+    return DEFAULT_LLM_CACHE_MAX_MB
+
+
+_llm_cache: Optional[LlmResponseCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def _get_llm_cache(config: RunConfig) -> Optional[LlmResponseCache]:
+    global _llm_cache
+    if not config.llm_cache:
+        return None
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LlmResponseCache(
+                os.path.join(get_cache_dir(), "llm_responses.sqlite3"),
+                config.llm_cache_max_age_hours * 3600,
+                config.llm_cache_max_mb * 1024 * 1024,
+            )
+        return _llm_cache
+
+
+def _get_llm_max_concurrent() -> int:
+    value = _get_env_int("LLM_MAX_CONCURRENT")
+    if value and value > 0:
+        return value
+    return DEFAULT_LLM_MAX_CONCURRENT
+
+
+def _get_llm_max_rpm() -> int:
+    value = _get_env_int("LLM_MAX_RPM")
+    if value and value > 0:
+        return value
+    return DEFAULT_LLM_MAX_RPM
+
+
+def _llm_stream_enabled() -> bool:
+    raw = (os.getenv("LLM_STREAM") or "").strip()
+    if raw == "":
+        return DEFAULT_LLM_STREAM
+    return raw == "1"
+
+
+def _get_llm_batch_size() -> int:
+    value = _get_env_int("LLM_BATCH_SIZE")
+    if value and value > 0:
+        return value
+    return DEFAULT_LLM_BATCH_SIZE
+
+
+def _get_llm_timeout() -> int:
+    value = _get_env_int("LLM_TIMEOUT_SECS")
+    if value and value > 0:
+        return value
+    return DEFAULT_LLM_TIMEOUT_SECS
+
+
+def _get_llm_run_timeout() -> int:
+    value = _get_env_int("LLM_RUN_TIMEOUT_SECS")
+    if value is not None and value >= 0:
+        return value
+    return DEFAULT_LLM_RUN_TIMEOUT_SECS
+
+
+def _get_llm_max_retries() -> int:
+    value = _get_env_int("LLM_MAX_RETRIES")
+    if value is not None and value >= 0:
+        return value
+    return DEFAULT_LLM_MAX_RETRIES
+
+
+def _get_llm_breaker_failures() -> int:
+    value = _get_env_int("LLM_BREAKER_FAILURES")
+    if value and value > 0:
+        return value
+    return DEFAULT_LLM_BREAKER_FAILURES
+
+
+_llm_rate_limiter: Optional[TokenBucket] = None
+_llm_rate_limiter_lock = threading.Lock()
+
+
+def _get_llm_rate_limiter(config: RunConfig) -> TokenBucket:
+    global _llm_rate_limiter
+    with _llm_rate_limiter_lock:
+        if _llm_rate_limiter is None:
+            _llm_rate_limiter = TokenBucket(config.llm_max_rpm, config.llm_max_concurrent)
+        return _llm_rate_limiter
+
+
+_llm_breaker: Optional[CircuitBreaker] = None
+_llm_breaker_lock = threading.Lock()
+
+
+def _get_llm_breaker(config: RunConfig) -> CircuitBreaker:
+    global _llm_breaker
+    with _llm_breaker_lock:
+        if _llm_breaker is None:
+            _llm_breaker = CircuitBreaker(config.llm_breaker_failures)
+        return _llm_breaker
+
+
+def _start_llm_run(config: RunConfig) -> None:
+    """Rearma el circuit breaker del LLM y fija el límite de tiempo de la ejecución."""
+    deadline = time.monotonic() + config.llm_run_timeout if config.llm_run_timeout > 0 else None
+    _get_llm_breaker(config).reset(deadline)
+
+
+class LlmUnavailableError(RuntimeError):
+    """El LLM no se llama más en esta ejecución (circuito abierto o sin tiempo)."""
+
+
+def _is_retryable_llm_error(exc: Exception) -> bool:
+    if isinstance(exc, (APIConnectionError, TimeoutError)):
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code in (408, 409, 429) or exc.status_code >= 500
+    return False
+
+
+def _retry_after_seconds(exc: Exception, attempt: int) -> float:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    raw = (headers.get("retry-after") or "").strip()
+    try:
+        value = float(raw)
+    except ValueError:
+        value = 0.0
+    if value > 0:
+        return value
+    base = DEFAULT_LLM_RATE_LIMIT_BACKOFF if isinstance(exc, RateLimitError) else DEFAULT_LLM_RETRY_BACKOFF
+    return base * (2 ** attempt) + random.uniform(0, base)
+
+
+def _call_llm_with_retries(config: RunConfig, call: Callable[[float], str]) -> str:
+    """Ejecuta `call(timeout)` respetando el ritmo, el circuit breaker y el
+    límite de tiempo de la ejecución; reintenta con backoff y jitter los
+    errores transitorios (timeouts, red, 408/409/429/5xx)."""
+    limiter = _get_llm_rate_limiter(config)
+    breaker = _get_llm_breaker(config)
+    metrics = run_metrics.current()
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise LlmUnavailableError("LLM desactivado para el resto de la ejecución")
+        if limiter.acquire(max_wait=breaker.remaining()) is None:
+            raise LlmUnavailableError("sin tiempo para llamar al LLM en esta ejecución")
+        remaining = breaker.remaining()
+        timeout = float(config.llm_timeout) if remaining is None else min(config.llm_timeout, remaining)
+        try:
+            result = call(timeout)
+        except _StreamAborted:
+            breaker.record_success()
+            raise
+        except Exception as exc:
+            metrics.inc("llm_errors", kind=type(exc).__name__)
+            if breaker.record_failure():
+                metrics.inc("llm_breaker_open")
+                print(f"[!] LLM: {config.llm_breaker_failures} fallos seguidos; no se llama más en esta ejecución.")
+            if (
+                not _is_retryable_llm_error(exc)
+                or attempt >= config.llm_max_retries
+                or not breaker.allow()
+            ):
+                raise
+            delay = _retry_after_seconds(exc, attempt)
+            remaining = breaker.remaining()
+            if remaining is not None and delay >= remaining:
+                raise
+            print(f"[!] LLM {type(exc).__name__}: reintento en {delay:.1f}s.")
+            if isinstance(exc, RateLimitError):
+                limiter.penalize(delay)
+            else:
+                time.sleep(delay)
+            metrics.inc("llm_retries")
+            attempt += 1
+            continue
+        breaker.record_success()
+        return result
+
+
+def _create_completion(
     client: OpenAI,
-    news_title: str,
-    news_content: str,
-    source_name: str,
+    messages: list[dict],
+    timeout: float,
+    stream: bool = False,
+    json_output: bool = False,
 ):
-    suggested_handle = _guess_source_handle(source_name) or source_name
-    title = _normalize_spaces(news_title)
-    content = _normalize_spaces(news_content)
-    if content and title:
-        noticia = f"{title}. {content}"
-    else:
-        noticia = title or content
+    extra = {"stream": True, "stream_options": {"include_usage": True}} if stream else {}
+    if json_output:
+        extra["response_format"] = {"type": "json_object"}
+    return client.chat.completions.create(
+        model=LLM_MODEL,
+        messages=messages,
+        temperature=LLM_TEMPERATURE,
+        timeout=timeout,
+        **extra,
+    )
 
-    summary_max_chars = _get_summary_max_chars()
-    question_max_chars = _get_question_max_chars()
 
-    # MODIFICACIÓN: Prompt diseñado para preguntas incisivas y concretas.
-    base_prompt = f"""
-NOTICIA: {noticia}
-MEDIO: {source_name}
-HANDLE_SUGERIDO: {suggested_handle}
+class _StreamAborted(Exception):
+    """La respuesta en streaming se cortó porque ya no iba a servir."""
+
+    def __init__(self, partial_text: str):
+        super().__init__("respuesta del LLM abortada")
+        self.partial_text = partial_text
+
+
+def _record_llm_usage(usage) -> None:
+    if usage is None:
+        return
+    metrics = run_metrics.current()
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    metrics.inc("llm_prompt_tokens", prompt_tokens)
+    metrics.inc("llm_completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+    # DeepSeek informa prompt_cache_hit/miss_tokens; OpenAI, prompt_tokens_details.cached_tokens.
+    hit_tokens = getattr(usage, "prompt_cache_hit_tokens", None)
+    if hit_tokens is None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        hit_tokens = getattr(details, "cached_tokens", None)
+    if hit_tokens is None:
+        return
+    miss_tokens = getattr(usage, "prompt_cache_miss_tokens", None)
+    if miss_tokens is None:
+        miss_tokens = max(prompt_tokens - hit_tokens, 0)
+    metrics.inc("llm_prompt_cache_hit_tokens", hit_tokens)
+    metrics.inc("llm_prompt_cache_miss_tokens", miss_tokens)
+
+
+def _stream_completion(
+    client: OpenAI,
+    messages: list[dict],
+    timeout: float,
+    should_abort: Optional[Callable[[str], bool]],
+) -> str:
+    """Consume la respuesta por trozos y la corta en cuanto `should_abort`
+    (evaluado con el texto acumulado) la da por perdida.
+
+    `timeout` acota la respuesta completa, no solo la espera entre trozos.
+    """
+    deadline = time.monotonic() + timeout
+    stream = _create_completion(client, messages, timeout, stream=True)
+    parts: list[str] = []
+    usage = None
+    try:
+        for chunk in stream:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"respuesta del LLM sin terminar tras {timeout:.0f}s")
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+            if should_abort and should_abort("".join(parts)):
+                run_metrics.current().inc("llm_stream_aborts")
+                raise _StreamAborted("".join(parts))
+    finally:
+        stream.close()
+        _record_llm_usage(usage)
+    return "".join(parts)
 
-TAREA: Devuelve una respuesta dividida en 2 partes usando EXACTAMENTE el separador ###.
+
+def _chat_completion(
+    client: OpenAI,
+    messages: list[dict],
+    config: RunConfig,
+    should_abort: Optional[Callable[[str], bool]] = None,
+    json_output: bool = False,
+) -> str:
+    """Devuelve el texto de la respuesta, cacheado si procede.
+
+    Con `llm_stream`, `should_abort` puede cortar la generación antes de
+    terminar; en ese caso se lanza `_StreamAborted` y no se cachea nada.
+    Las respuestas JSON (`json_output`) se piden siempre sin streaming.
+    """
+    cache = _get_llm_cache(config)
+    metrics = run_metrics.current()
+    cache_key = ""
+    if cache:
+        cache_key = cache.make_key(LLM_MODEL, messages, LLM_TEMPERATURE)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            metrics.inc("llm_cache_hits")
+            return cached
+
+    def request(timeout: float) -> str:
+        if config.llm_stream and not json_output:
+            return _stream_completion(client, messages, timeout, should_abort)
+        resp = _create_completion(client, messages, timeout, json_output=json_output)
+        _record_llm_usage(getattr(resp, "usage", None))
+        return resp.choices[0].message.content or ""
+
+    with metrics.timer("llm_request_seconds"):
+        content_text = _call_llm_with_retries(config, request).strip()
+    if cache and content_text:
+        cache.put(cache_key, content_text)
+    return content_text
+
+
+_SYSTEM_PROMPT = (
+    "Eres un analista de fútbol incisivo y viral en X, pero riguroso: "
+    "no inventas datos ni contexto, y evitas muletillas o frases vacías."
+)
+
+
+def _post_task_instructions(summary_max_chars: int, question_max_chars: int) -> str:
+    """Instrucciones de redacción comunes al modo individual y al de lotes.
+
+    No llevan nada propio de la noticia: van al principio del prompt, idénticas
+    byte a byte entre llamadas, para que el proveedor pueda reutilizar su caché
+    de prefijos (context caching de DeepSeek). Los datos van detrás.
+    """
+    return f"""
+TAREA: Con los datos (NOTICIA, MEDIO, HANDLE_SUGERIDO) que aparecen al final, devuelve una respuesta dividida en 2 partes usando EXACTAMENTE el separador ###.
 
 PARTE 1 (RESUMEN):
 - Resumen de la noticia, máximo {summary_max_chars} caracteres.
@@ -725,7 +1896,7 @@ PARTE 2 (PREGUNTA + FUENTE + HASHTAGS):
 - EVITA muletillas genéricas como: "¿Hasta cuándo?", "¿Tan difícil?", "¿De verdad?".
 - NO empieces con "¿Por qué", "¿De verdad", "¿Tan", "¿Hasta cuándo".
 - NO repitas el resumen.
-- 1 línea con la fuente: "Fuente: {suggested_handle}".
+- 1 línea con la fuente: "Fuente: " seguido del HANDLE_SUGERIDO.
 - 1 línea final con 1 hashtag que sea el más posible trending topic relacionado con el tema. Si se menciona a alguien importante, usa su hashtag oficial. Si no, usa #RealMadrid o #FCBarcelona según corresponda.
 
 REGLAS GENERALES:
@@ -734,34 +1905,69 @@ REGLAS GENERALES:
 3. RIGOR: Usa solo información explícita de NOTICIA. No inventes contexto (tabla, entrenador, resultados, fichajes, lesiones o premios).
 4. NOMBRES: No menciones personas o equipos que no aparezcan en NOTICIA.
 5. SI HAY POCA INFORMACIÓN: Haz una pregunta general sin afirmar hechos externos.
+"""
+
+
+def generate_expert_post(
+    client: OpenAI,
+    news_title: str,
+    news_content: str,
+    source_name: str,
+    config: Optional[RunConfig] = None,
+):
+    config = config or RunConfig.from_env()
+    suggested_handle = _guess_source_handle(source_name) or source_name
+    title = _normalize_spaces(news_title)
+    content = _normalize_spaces(news_content)
+    if content and title:
+        noticia = f"{title}. {content}"
+    else:
+        noticia = title or content
+
+    summary_max_chars = config.summary_max_chars
+    question_max_chars = config.question_max_chars
+
+    # MODIFICACIÓN: Prompt diseñado para preguntas incisivas y concretas.
+    base_prompt = _post_task_instructions(summary_max_chars, question_max_chars) + f"""
+NOTICIA: {noticia}
+MEDIO: {source_name}
+HANDLE_SUGERIDO: {suggested_handle}
 """
     keywords = _extract_keywords(title) or _extract_keywords(content)
     keyword_hint = ", ".join(keywords[:5])
     retry_note = ""
     last_response = None
+    attempts = 2
+
+    def question_fails(partial_text: str) -> bool:
+        return _partial_question_fails(partial_text, title, content)
 
-    for _ in range(2):
+    for attempt in range(attempts):
         prompt = base_prompt + retry_note
         try:
-            resp = client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[
-                    {"role": "system", "content": "Eres un analista de fútbol incisivo y viral en X, pero riguroso: no inventas datos ni contexto, y evitas muletillas o frases vacías."},
+            content_text = _chat_completion(
+                client,
+                [
+                    {"role": "system", "content": _SYSTEM_PROMPT},
                     {"role": "user", "content": prompt},
                 ],
-                temperature=0.7,
+                config,
+                # En el último intento no hay reintento al que saltar.
+                should_abort=question_fails if attempt < attempts - 1 else None,
             )
+        except _StreamAborted:
+            # La pregunta ya fallaba: se corta la respuesta y se reintenta.
+            pass
         except Exception:
             break
-
-        content_text = resp.choices[0].message.content.strip()
-        if not content_text:
-            continue
-        last_response = content_text
-
-        question = _extract_question_line(content_text)
-        if not _question_needs_regen(question, title, content):
-            return content_text
+        else:
+            if not content_text:
+                continue
+            last_response = content_text
+            question = _extract_question_line(content_text)
+            if not _question_needs_regen(question, title, content):
+                return content_text
+        run_metrics.current().inc("llm_regenerations")
 
         if keyword_hint:
             retry_note = (
@@ -776,6 +1982,87 @@ REGLAS GENERALES:
 
     return last_response
 
+
+_BATCH_FORMAT_INSTRUCTIONS = (
+    "\nFORMATO: Aplica la TAREA a cada noticia por separado, usando solo su propia "
+    "NOTICIA, MEDIO y HANDLE_SUGERIDO. "
+    'Devuelve SOLO un objeto JSON {"posts": [{"id": <número entre corchetes>, '
+    '"respuesta": "<PARTE 1>\\n###\\n<PARTE 2>"}]} con una entrada por noticia.\n'
+)
+
+
+def generate_expert_posts_batch(
+    client: OpenAI,
+    items: list[dict],
+    config: Optional[RunConfig] = None,
+) -> list[Optional[str]]:
+    """Redacta varias noticias en una sola petición al LLM.
+
+    Devuelve un texto por noticia, en el mismo orden, o None para las que no
+    vinieron en la respuesta o cuya pregunta no pasa `_question_needs_regen`;
+    esas deben pasar por `generate_expert_post`.
+    """
+    config = config or RunConfig.from_env()
+    results: list[Optional[str]] = [None] * len(items)
+    if not items:
+        return results
+
+    news_blocks = []
+    checks = []
+    for index, item in enumerate(items, start=1):
+        source_name = _extract_domain(item.get("url", ""))
+        suggested_handle = _guess_source_handle(source_name) or source_name
+        title = _normalize_spaces(item.get("title", ""))
+        content = _normalize_spaces(item.get("content", ""))
+        noticia = f"{title}. {content}" if title and content else (title or content)
+        news_blocks.append(
+            f"[{index}]\nNOTICIA: {noticia}\nMEDIO: {source_name}\nHANDLE_SUGERIDO: {suggested_handle}"
+        )
+        checks.append((title, content))
+
+    prompt = (
+        _post_task_instructions(config.summary_max_chars, config.question_max_chars)
+        + _BATCH_FORMAT_INSTRUCTIONS
+        + "\nNOTICIAS:\n\n"
+        + "\n\n".join(news_blocks)
+        + "\n"
+    )
+    try:
+        content_text = _chat_completion(
+            client,
+            [
+                {"role": "system", "content": _SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            config,
+            json_output=True,
+        )
+        posts = json.loads(content_text).get("posts") or []
+    except Exception as exc:
+        print(f"[!] Lote LLM fallido ({len(items)} noticias): {exc}")
+        return results
+
+    for post in posts:
+        if not isinstance(post, dict):
+            continue
+        try:
+            index = int(post.get("id")) - 1
+        except (TypeError, ValueError):
+            continue
+        text = (post.get("respuesta") or "").strip()
+        if not 0 <= index < len(items) or not text or results[index] is not None:
+            continue
+        title, content = checks[index]
+        if _question_needs_regen(_extract_question_line(text), title, content):
+            continue
+        results[index] = text
+
+    accepted = sum(1 for text in results if text)
+    metrics = run_metrics.current()
+    metrics.inc("llm_batch_items", accepted, status="accepted")
+    metrics.inc("llm_batch_items", len(items) - accepted, status="fallback")
+    return results
+
 # === Utilidades de texto ===
 def _normalize_spaces(text: str) -> str:
     return " ".join((text or "").split()).strip()
@@ -803,40 +2090,241 @@ def _guess_source_handle(source_name: str) -> Optional[str]:
 
 
 # === Orquestación ===
-def build_macro_drafts():
-    """Orquesta el flujo fútbol y devuelve borradores listos para revision."""
-    client = OpenAI(
-        api_key=os.getenv("DEEPSEEK_API_KEY"), base_url="https://api.deepseek.com"
+def _draft_from_post(item: dict, post: Optional[str]) -> Optional[dict]:
+    if not post:
+        run_metrics.current().inc("drafts", status="failed")
+        return None
+    run_metrics.current().inc("drafts", status="generated")
+    return {
+        "ai_text": _strip_analysis_prefix(post),
+        "url": item.get("url", ""),
+        "club": (item.get("club") or "").strip(),
+        "news_keys": list(item.get("news_keys") or [_news_key(item)]),
+        "feed_key": item.get("feed_key") or "",
+        "published_ts": float(item.get("published_ts") or 0.0),
+        "guid": _watermark_guid(item),
+    }
+
+
+def _generate_draft(client: OpenAI, item: dict, config: RunConfig) -> Optional[dict]:
+    post = generate_expert_post(
+        client,
+        item.get("title", ""),
+        item.get("content", ""),
+        _extract_domain(item.get("url", "")),
+        config,
     )
+    return _draft_from_post(item, post)
+
+
+def _generate_drafts(
+    client: OpenAI,
+    items: list[dict],
+    config: RunConfig,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> list[Optional[dict]]:
+    """Genera los borradores de un lote; lo que el lote no resuelve pasa por
+    la generación individual, salvo que `should_stop` indique que ya no hacen
+    falta."""
+    if len(items) == 1:
+        return [_generate_draft(client, items[0], config)]
+    posts = generate_expert_posts_batch(client, items, config)
+    drafts: list[Optional[dict]] = []
+    for item, post in zip(items, posts):
+        if post:
+            drafts.append(_draft_from_post(item, post))
+        elif should_stop is not None and should_stop():
+            drafts.append(None)
+        else:
+            drafts.append(_generate_draft(client, item, config))
+    return drafts
+
+
+def _draft_batches(items: list[dict], config: RunConfig) -> list[list[dict]]:
+    size = max(1, config.llm_batch_size)
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
 
-    raw_news = get_hot_macro_news()
+def _stream_drafts_enabled() -> bool:
+    raw = (os.getenv("STREAM_DRAFTS") or "").strip()
+    if raw == "":
+        return DEFAULT_STREAM_DRAFTS
+    return raw == "1"
+
+
+def _get_stream_queue_size() -> int:
+    value = _get_env_int("STREAM_QUEUE_SIZE")
+    if value and value > 0:
+        return value
+    return DEFAULT_STREAM_QUEUE_SIZE
+
+
+def _make_llm_client(config: RunConfig) -> OpenAI:
+    base_url = (os.getenv("DEEPSEEK_BASE_URL") or "").strip() or DEFAULT_DEEPSEEK_BASE_URL
+    # Los reintentos los gestiona _call_llm_with_retries, no el SDK.
+    return OpenAI(
+        api_key=os.getenv("DEEPSEEK_API_KEY"),
+        base_url=base_url,
+        timeout=config.llm_timeout,
+        max_retries=0,
+    )
+
+
+def _select_news_for_drafts(config: RunConfig) -> list[dict]:
+    raw_news = get_hot_macro_news(config)
     if not raw_news:
         return []
 
-    diverse_news = select_diverse_news(raw_news)
+    processed_store = _get_processed_store(config)
+    skip_keys = processed_store.active_keys() if processed_store else None
+    diverse_news = select_diverse_news(raw_news, skip_keys=skip_keys, config=config)
+    watermarks = _get_watermark_store(config)
+    if watermarks:
+        # Hasta que se entreguen, las seleccionadas no quedan tapadas por la
+        # marca que dejen otras noticias más nuevas del mismo feed.
+        for item in diverse_news:
+            if item.get("feed_key") and item.get("published_ts"):
+                watermarks.hold(item["feed_key"], _watermark_guid(item))
     print(f"[*] Analizando {len(diverse_news)} eventos clave.")
-
-    drafts = []
-    for item in diverse_news:
-        url = item.get("url", "")
-        club = (item.get("club") or "").strip()
-        source_name = _extract_domain(url)
-        post = generate_expert_post(
-            client,
-            item.get("title", ""),
-            item.get("content", ""),
-            source_name,
+    return diverse_news
+
+
+def mark_draft_delivered(draft: dict, config: Optional[RunConfig] = None) -> None:
+    """Anota como ya redactada la noticia de un borrador entregado en Telegram
+    y, en modo incremental, avanza hasta ella la marca de su feed.
+
+    Se llama tras el envío, no al generar: un borrador que no llega (envío
+    fallido, LLM caído o proceso interrumpido) deja su noticia disponible
+    para otra ejecución.
+    """
+    config = config or RunConfig.from_env()
+    processed_store = _get_processed_store(config)
+    if processed_store:
+        for key in draft.get("news_keys") or []:
+            processed_store.add(key)
+    watermarks = _get_watermark_store(config)
+    if watermarks and draft.get("feed_key") and draft.get("published_ts"):
+        watermarks.advance(draft["feed_key"], draft["published_ts"], draft.get("guid") or "")
+
+
+def _report_llm_usage(llm_cache: Optional[LlmResponseCache]) -> None:
+    if llm_cache:
+        print(f"[*] Cache LLM: {llm_cache.hits} aciertos, {llm_cache.misses} llamadas a la API.")
+    metrics = run_metrics.current()
+    hit_tokens = metrics.counter("llm_prompt_cache_hit_tokens")
+    miss_tokens = metrics.counter("llm_prompt_cache_miss_tokens")
+    if hit_tokens or miss_tokens:
+        ratio = hit_tokens / (hit_tokens + miss_tokens)
+        print(
+            f"[*] Prompt: {hit_tokens:.0f} tokens en la caché del proveedor, "
+            f"{miss_tokens:.0f} sin caché ({ratio:.0%} de aciertos)."
         )
-        if post:
-            post = _strip_analysis_prefix(post)
-            drafts.append(
-                {
-                    "ai_text": post,
-                    "url": url,
-                    "club": club,
-                }
-            )
 
-        time.sleep(2)
 
+def build_macro_drafts(config: Optional[RunConfig] = None):
+    """Orquesta el flujo fútbol y devuelve borradores listos para revision."""
+    config = config or RunConfig.from_env()
+    run_metrics.start_run()
+    client = _make_llm_client(config)
+    llm_cache = _get_llm_cache(config)
+    if llm_cache:
+        llm_cache.reset_stats()
+
+    diverse_news = _select_news_for_drafts(config)
+    if not diverse_news:
+        return []
+    # El tiempo de LLM_RUN_TIMEOUT_SECS empieza a contar tras leer los feeds.
+    _start_llm_run(config)
+
+    # El ritmo de llamadas lo marca el token bucket del LLM; map conserva el
+    # orden de select_diverse_news.
+    batches = _draft_batches(diverse_news, config)
+    workers = max(1, min(config.llm_max_concurrent, len(batches)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        generated = executor.map(lambda batch: _generate_drafts(client, batch, config), batches)
+        drafts = [draft for batch in generated for draft in batch if draft]
+
+    _report_llm_usage(llm_cache)
     return drafts
+
+
+def stream_macro_drafts(config: Optional[RunConfig] = None, metrics: Optional[dict] = None):
+    """Como build_macro_drafts, pero entrega cada borrador en cuanto están
+    listos él y los anteriores, en el orden de select_diverse_news.
+
+    Entre la generación y el consumidor hay una cola acotada
+    (STREAM_QUEUE_SIZE): si el envío va lento, los hilos del LLM esperan.
+    Los hilos son daemon y dejan de generar cuando el consumidor para
+    (p. ej. al llegar a MAX_DRAFTS), sin alargar el proceso.
+    Si se pasa `metrics`, se rellena con `time_to_first_draft`, `drafts` y
+    `total_time` (segundos desde el inicio de la ejecución).
+    """
+    config = config or RunConfig.from_env()
+    metrics = metrics if metrics is not None else {}
+    started = time.monotonic()
+    metrics.update({"time_to_first_draft": None, "drafts": 0, "total_time": 0.0})
+    run_report = run_metrics.start_run()
+    client = _make_llm_client(config)
+    llm_cache = _get_llm_cache(config)
+    if llm_cache:
+        llm_cache.reset_stats()
+
+    diverse_news = _select_news_for_drafts(config)
+    if not diverse_news:
+        metrics["total_time"] = time.monotonic() - started
+        return
+    _start_llm_run(config)
+
+    batches = _draft_batches(diverse_news, config)
+    todo: "queue.Queue[tuple[int, list[dict]]]" = queue.Queue()
+    offset = 0
+    for batch in batches:
+        todo.put((offset, batch))
+        offset += len(batch)
+    done_queue: queue.Queue = queue.Queue(maxsize=config.stream_queue_size)
+    stop = threading.Event()
+
+    def worker() -> None:
+        while not stop.is_set():
+            try:
+                start, batch = todo.get_nowait()
+            except queue.Empty:
+                return
+            drafts: list[Optional[dict]] = []
+            try:
+                drafts = _generate_drafts(client, batch, config, should_stop=stop.is_set)
+            except Exception as exc:
+                print(f"[!] Error generando borradores: {exc}")
+            drafts = drafts or [None] * len(batch)
+            for index, draft in enumerate(drafts, start=start):
+                while not stop.is_set():
+                    try:
+                        done_queue.put((index, draft), timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+
+    for _ in range(max(1, min(config.llm_max_concurrent, len(batches)))):
+        threading.Thread(target=worker, daemon=True).start()
+    # Los borradores que terminan antes de tiempo esperan a los anteriores.
+    ready: dict[int, Optional[dict]] = {}
+    next_index = 0
+    try:
+        while next_index < len(diverse_news):
+            index, draft = done_queue.get()
+            ready[index] = draft
+            while next_index in ready:
+                draft = ready.pop(next_index)
+                next_index += 1
+                if not draft:
+                    continue
+                if metrics["time_to_first_draft"] is None:
+                    metrics["time_to_first_draft"] = time.monotonic() - started
+                    print(f"[*] Primer borrador listo en {metrics['time_to_first_draft']:.1f}s.")
+                    run_report.set("time_to_first_draft_seconds", metrics["time_to_first_draft"])
+                metrics["drafts"] += 1
+                yield draft
+    finally:
+        stop.set()
+        metrics["total_time"] = time.monotonic() - started
+        _report_llm_usage(llm_cache)
@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+METRIC_PREFIX = "ai_posts_"
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _label_key(labels: dict) -> LabelKey:
+    return tuple(sorted((str(name), str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    parts = []
+    for name, value in key:
+        escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class RunMetrics:
+    """Contadores, gauges y tiempos de una ejecución, exportables como JSON
+    o como textfile de Prometheus (node_exporter textfile collector)."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[LabelKey, float]] = {}
+        self._gauges: dict[str, dict[LabelKey, float]] = {}
+        self._observations: dict[str, dict[LabelKey, list[float]]] = {}
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._observations.setdefault(name, {})
+            stats = series.get(key)
+            if stats is None:
+                series[key] = [1, value, value]
+            else:
+                stats[0] += 1
+                stats[1] += value
+                stats[2] = max(stats[2], value)
+
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def timer(self, name: str, **labels) -> "_Timer":
+        return _Timer(self, name, labels)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "duration_secs": round(time.monotonic() - self._started, 3),
+                "counters": [
+                    {"name": name, "labels": dict(key), "value": value}
+                    for name, series in sorted(self._counters.items())
+                    for key, value in series.items()
+                ],
+                "gauges": [
+                    {"name": name, "labels": dict(key), "value": value}
+                    for name, series in sorted(self._gauges.items())
+                    for key, value in series.items()
+                ],
+                "timings": [
+                    {
+                        "name": name,
+                        "labels": dict(key),
+                        "count": stats[0],
+                        "sum": round(stats[1], 6),
+                        "max": round(stats[2], 6),
+                    }
+                    for name, series in sorted(self._observations.items())
+                    for key, stats in series.items()
+                ],
+            }
+
+    def to_prometheus(self) -> str:
+        report = self.to_dict()
+        lines: list[str] = []
+        typed: set[str] = set()
+
+        def emit(name: str, metric_type: str, labels: dict, value: float) -> None:
+            full_name = METRIC_PREFIX + name
+            if full_name not in typed:
+                lines.append(f"# TYPE {full_name} {metric_type}")
+                typed.add(full_name)
+            lines.append(f"{full_name}{_format_labels(_label_key(labels))} {value}")
+
+        for entry in report["counters"]:
+            emit(entry["name"] + "_total", "counter", entry["labels"], entry["value"])
+        for entry in report["gauges"]:
+            emit(entry["name"], "gauge", entry["labels"], entry["value"])
+        for entry in report["timings"]:
+            emit(entry["name"] + "_sum", "gauge", entry["labels"], entry["sum"])
+            emit(entry["name"] + "_count", "gauge", entry["labels"], entry["count"])
+            emit(entry["name"] + "_max", "gauge", entry["labels"], entry["max"])
+        emit("run_duration_seconds", "gauge", {}, report["duration_secs"])
+        emit("run_timestamp_seconds", "gauge", {}, int(report["started_at"]))
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_path: str = "", prom_path: str = "") -> None:
+        for path, payload in (
+            (json_path, lambda: json.dumps(self.to_dict(), ensure_ascii=False, indent=2)),
+            (prom_path, self.to_prometheus),
+        ):
+            if not path:
+                continue
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as handle:
+                    handle.write(payload())
+                os.replace(tmp_path, path)
+            except OSError as exc:
+                print(f"[!] No se pudieron escribir las métricas en {path}: {exc}")
+
+
+class _Timer:
+    def __init__(self, metrics: RunMetrics, name: str, labels: dict):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.elapsed = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.elapsed = time.perf_counter() - self._started
+        self.metrics.observe(self.name, self.elapsed, **self.labels)
+
+
+_current: Optional[RunMetrics] = None
+_current_lock = threading.Lock()
+
+
+def start_run() -> RunMetrics:
+    global _current
+    with _current_lock:
+        _current = RunMetrics()
+        return _current
+
+
+def current() -> RunMetrics:
+    """Métricas de la ejecución en curso (crea una si aún no hay)."""
+    global _current
+    with _current_lock:
+        if _current is None:
+            _current = RunMetrics()
+        return _current
@@ -0,0 +1,100 @@
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Limitador de ritmo (token bucket) compartido entre hilos.
+
+    `rate_per_minute` fija el ritmo sostenido y `capacity` la ráfaga máxima.
+    `penalize` congela el bucket (p. ej. tras un 429 con Retry-After).
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: int = 1):
+        self.rate_per_sec = max(rate_per_minute, 0.001) / 60.0
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_sec)
+            self._updated = now
+
+    def acquire(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """Bloquea hasta obtener un token; devuelve los segundos esperados.
+
+        Con `max_wait`, devuelve None sin esperar si el token no llegaría a
+        tiempo (p. ej. por un `penalize` más largo que el tiempo que queda).
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    delay = self._blocked_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                else:
+                    delay = (1 - self._tokens) / self.rate_per_sec
+            if max_wait is not None and waited + delay > max_wait:
+                return None
+            time.sleep(delay)
+            waited += delay
+
+    def penalize(self, seconds: float) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + max(seconds, 0.0))
+            self._tokens = 0.0
+            self._updated = now
+
+
+class CircuitBreaker:
+    """Corta las llamadas a un servicio durante el resto de la ejecución.
+
+    Se abre tras `failure_threshold` fallos seguidos (un éxito pone la cuenta
+    a cero) o al pasar `deadline` (instante de `time.monotonic`). Una vez
+    abierto solo se cierra con `reset`, al empezar otra ejecución.
+    """
+
+    def __init__(self, failure_threshold: int):
+        self.failure_threshold = max(failure_threshold, 1)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, deadline: Optional[float] = None) -> None:
+        with self._lock:
+            self.deadline = deadline
+            self._failures = 0
+            self._open = False
+
+    def remaining(self) -> Optional[float]:
+        """Segundos hasta `deadline`, o None si no hay límite."""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def allow(self) -> bool:
+        with self._lock:
+            return not self._open and (self.deadline is None or time.monotonic() < self.deadline)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self) -> bool:
+        """Anota un fallo; devuelve True si con él se abre el circuito."""
+        with self._lock:
+            if self._open:
+                return False
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._open = True
+                return True
+            return False
@@ -1,17 +1,19 @@
 import os
 from datetime import datetime
-from typing import Optional, Union
+from itertools import islice
+from typing import Iterable, Optional, Union
 from urllib.parse import quote
 
 import telebot
 from dotenv import load_dotenv
 from telebot import types
 
-from macro_engine import build_macro_drafts
+import metrics as run_metrics
+from macro_engine import RunConfig, build_macro_drafts, mark_draft_delivered, stream_macro_drafts
+from telegram_delivery import SendStats, TelegramSender
 
 load_dotenv()
 
-DEFAULT_X_INTENT_MAX_CHARS = 280
 DEFAULT_URL_WEIGHT = 23
 
 
@@ -29,15 +31,6 @@ def _normalize_intent_text(text: str) -> str:
     return normalized.replace("%", "%25")
 
 
-def _get_x_intent_max_chars() -> int:
-    raw = (os.getenv("X_INTENT_MAX_CHARS") or "").strip()
-    if raw.isdigit():
-        value = int(raw)
-        if value > 0:
-            return value
-    return DEFAULT_X_INTENT_MAX_CHARS
-
-
 def _extract_intent_hashtags(text: str, max_count: int = 2) -> tuple[str, list[str]]:
     import re
 
@@ -215,8 +208,20 @@ def _require_env(name: str) -> str:
     return value
 
 
-def send_drafts_scheduled(drafts: list[dict], token: str, chat_id: Union[int, str]) -> int:
-    bot = telebot.TeleBot(token)
+def send_drafts_scheduled(
+    drafts: Iterable[dict],
+    token: str,
+    chat_id: Union[int, str],
+    config: Optional[RunConfig] = None,
+) -> int:
+    config = config or RunConfig.from_env()
+    sender = TelegramSender(
+        telebot.TeleBot(token),
+        config.telegram_chat_msgs_per_min,
+        config.telegram_global_msgs_per_sec,
+        config.telegram_max_retries,
+    )
+    stats = SendStats()
     sent = 0
 
     for index, draft in enumerate(drafts, start=1):
@@ -242,7 +247,7 @@ def send_drafts_scheduled(drafts: list[dict], token: str, chat_id: Union[int, st
             intent_base_text,
             source_url,
             intent_tags,
-            _get_x_intent_max_chars(),
+            config.x_intent_max_chars,
         )
         intent_url = (
             "https://twitter.com/intent/tweet?text="
@@ -256,10 +261,13 @@ def send_drafts_scheduled(drafts: list[dict], token: str, chat_id: Union[int, st
         keyboard = types.InlineKeyboardMarkup()
         keyboard.row(types.InlineKeyboardButton("🚀 Abrir en X", url=intent_url))
 
-        bot.send_message(chat_id, caption_text, reply_markup=keyboard)
+        if sender.send_message(chat_id, caption_text, stats=stats, reply_markup=keyboard) is None:
+            continue
 
+        mark_draft_delivered(draft, config)
         sent += 1
 
+    print(stats.report())
     return sent
 
 
@@ -279,20 +287,27 @@ def main() -> int:
         print(f"[!] Configuración incompleta: {exc}")
         return 2
 
-    drafts = build_macro_drafts()
-    if not drafts:
+    config = RunConfig.from_env()
+    metrics: dict = {}
+    if config.stream_drafts:
+        drafts = stream_macro_drafts(config, metrics)
+    else:
+        drafts = build_macro_drafts(config)
+
+    sent = send_drafts_scheduled(
+        drafts=islice(drafts, config.max_drafts), token=token, chat_id=chat_id, config=config
+    )
+    run_metrics.current().write(config.metrics_json_path, config.metrics_prom_path)
+    if not sent:
         if (os.getenv("SEND_EMPTY_MESSAGE") or "").strip() == "1":
             bot = telebot.TeleBot(token)
             bot.send_message(chat_id, "No se encontraron borradores en esta ejecución.")
         print("[*] Sin borradores.")
         return 0
 
-    max_drafts_raw = (os.getenv("MAX_DRAFTS") or "").strip()
-    if max_drafts_raw.isdigit():
-        drafts = drafts[: int(max_drafts_raw)]
-
-    sent = send_drafts_scheduled(drafts=drafts, token=token, chat_id=chat_id)
     print(f"[*] Enviados {sent} borradores a Telegram.")
+    if metrics.get("time_to_first_draft") is not None:
+        print(f"[*] Tiempo hasta el primer borrador: {metrics['time_to_first_draft']:.1f}s.")
     return 0
 
 
@@ -0,0 +1,353 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+DEFAULT_CACHE_DIR = ".cache"
+
+
+def get_cache_dir() -> str:
+    path = (os.getenv("CACHE_DIR") or "").strip() or DEFAULT_CACHE_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _write_json_atomic(path: str, payload) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(payload, handle, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# === Caché de validadores HTTP (ETag / Last-Modified) por feed ===
+class FeedValidatorCache:
+    """Guarda ETag/Last-Modified y los items ya parseados de cada feed."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = {}
+        self._dirty = False
+        try:
+            with open(path, encoding="utf-8") as handle:
+                data = json.load(handle)
+            if isinstance(data, dict):
+                self._entries = data
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def request_headers(self, url: str) -> dict[str, str]:
+        with self._lock:
+            entry = self._entries.get(url) or {}
+        headers: dict[str, str] = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def cached_items(self, url: str) -> Optional[list[dict]]:
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            self.hits += 1
+            return [dict(item) for item in entry.get("items") or []]
+
+    def store(
+        self,
+        url: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        items: list[dict],
+    ) -> None:
+        with self._lock:
+            self.misses += 1
+            if not etag and not last_modified:
+                if self._entries.pop(url, None) is not None:
+                    self._dirty = True
+                return
+            self._entries[url] = {
+                "etag": etag or "",
+                "last_modified": last_modified or "",
+                "items": [dict(item) for item in items],
+            }
+            self._dirty = True
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                _write_json_atomic(self.path, self._entries)
+            except OSError as exc:
+                print(f"[!] No se pudo guardar la caché RSS: {exc}")
+                return
+            self._dirty = False
+
+
+# === Marcas de agua por fuente (modo incremental) ===
+class WatermarkStore:
+    """Última noticia entregada (published_ts + guid) por feed, y las
+    seleccionadas que aún no se han entregado ("pending").
+
+    La marca solo avanza con `advance()`, al entregar un borrador. Las
+    noticias apartadas con `hold()` siguen pasando aunque queden por debajo
+    de la marca, hasta que se entregan o desaparecen del feed (`prune()`):
+    si el LLM o el envío fallan, la siguiente ejecución vuelve a verlas.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._marks: dict[str, dict] = {}
+        try:
+            with open(path, encoding="utf-8") as handle:
+                data = json.load(handle)
+            if isinstance(data, dict):
+                self._marks = data
+        except (OSError, ValueError):
+            self._marks = {}
+
+    def get(self, source_key: str) -> Optional[dict]:
+        with self._lock:
+            mark = self._marks.get(source_key)
+            return dict(mark) if mark else None
+
+    def hold(self, source_key: str, guid: str) -> None:
+        with self._lock:
+            mark = self._marks.setdefault(source_key, {})
+            pending = mark.setdefault("pending", [])
+            if guid in pending:
+                return
+            pending.append(guid)
+            self._save()
+
+    def advance(self, source_key: str, published_ts: float, guid: str) -> None:
+        with self._lock:
+            mark = self._marks.setdefault(source_key, {})
+            pending = mark.get("pending") or []
+            changed = guid in pending
+            if changed:
+                pending.remove(guid)
+            if published_ts > float(mark.get("published_ts") or 0.0):
+                mark.update({"published_ts": published_ts, "guid": guid})
+                changed = True
+            if changed:
+                self._save()
+
+    def prune(self, source_key: str, live_guids: set[str]) -> None:
+        with self._lock:
+            mark = self._marks.get(source_key) or {}
+            pending = mark.get("pending") or []
+            kept = [guid for guid in pending if guid in live_guids]
+            if len(kept) == len(pending):
+                return
+            mark["pending"] = kept
+            self._save()
+
+    def _save(self) -> None:
+        try:
+            _write_json_atomic(self.path, self._marks)
+        except OSError as exc:
+            print(f"[!] No se pudieron guardar las marcas de agua RSS: {exc}")
+
+
+# === Registro de noticias ya enviadas al LLM ===
+class ProcessedNewsStore:
+    """Claves de noticias ya redactadas, con caducidad (TTL) en SQLite."""
+
+    def __init__(self, path: str, ttl_secs: float):
+        self.ttl_secs = ttl_secs
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS processed_news ("
+                "key TEXT PRIMARY KEY, processed_at REAL NOT NULL)"
+            )
+
+    def _purge_expired(self) -> None:
+        cutoff = time.time() - self.ttl_secs
+        with self._conn:
+            self._conn.execute("DELETE FROM processed_news WHERE processed_at < ?", (cutoff,))
+
+    def active_keys(self) -> set[str]:
+        with self._lock:
+            self._purge_expired()
+            rows = self._conn.execute("SELECT key FROM processed_news").fetchall()
+        return {row[0] for row in rows}
+
+    def add(self, key: str) -> None:
+        if not key:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO processed_news (key, processed_at) VALUES (?, ?)",
+                (key, time.time()),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# === Caché de respuestas del LLM (direccionada por contenido) ===
+class LlmResponseCache:
+    """Respuestas del LLM indexadas por hash de la petición, con límite de edad y tamaño."""
+
+    def __init__(self, path: str, max_age_secs: float, max_bytes: int):
+        self.max_age_secs = max_age_secs
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS llm_responses_created_at "
+                "ON llm_responses (created_at)"
+            )
+        with self._lock:
+            self._evict()
+
+    @staticmethod
+    def make_key(model: str, messages: list[dict], temperature: float) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature},
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        cutoff = time.time() - self.max_age_secs
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM llm_responses WHERE key = ? AND created_at >= ?",
+                (key, cutoff),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        if not response:
+            return
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, response, created_at, size) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, response, time.time(), size),
+                )
+            self._evict()
+
+    def _evict(self) -> None:
+        cutoff = time.time() - self.max_age_secs
+        with self._conn:
+            self._conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (cutoff,))
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = self._conn.execute(
+                "SELECT key, size FROM llm_responses ORDER BY created_at"
+            ).fetchall()
+            stale: list[tuple[str]] = []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                stale.append((key,))
+                total -= size
+            self._conn.executemany("DELETE FROM llm_responses WHERE key = ?", stale)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# === Borradores pendientes del bot de Telegram ===
+class PendingPostStore:
+    """Texto de cada borrador enviado, por message_id, acotado por TTL y tamaño."""
+
+    def __init__(self, path: str, ttl_secs: float, max_items: int):
+        self.ttl_secs = ttl_secs
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pending_posts ("
+                "message_id INTEGER PRIMARY KEY, text TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS pending_posts_created_at "
+                "ON pending_posts (created_at)"
+            )
+        with self._lock:
+            self._evict()
+
+    def get(self, message_id: int) -> Optional[str]:
+        cutoff = time.time() - self.ttl_secs
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM pending_posts WHERE message_id = ? AND created_at >= ?",
+                (message_id, cutoff),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, message_id: int, text: str) -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pending_posts (message_id, text, created_at) "
+                    "VALUES (?, ?, ?)",
+                    (message_id, text, time.time()),
+                )
+            self._evict()
+
+    def pop(self, message_id: int) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM pending_posts WHERE message_id = ?", (message_id,)
+            ).fetchone()
+            with self._conn:
+                self._conn.execute("DELETE FROM pending_posts WHERE message_id = ?", (message_id,))
+        return row[0] if row else None
+
+    def _evict(self) -> None:
+        cutoff = time.time() - self.ttl_secs
+        with self._conn:
+            self._conn.execute("DELETE FROM pending_posts WHERE created_at < ?", (cutoff,))
+            self._conn.execute(
+                "DELETE FROM pending_posts WHERE message_id NOT IN ("
+                "SELECT message_id FROM pending_posts ORDER BY created_at DESC LIMIT ?)",
+                (self.max_items,),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -3,18 +3,20 @@ import re
 import threading
 import time
 from datetime import datetime
-from typing import Dict, Optional, Union
+from typing import Optional, Union
 from urllib.parse import quote
 
 import telebot
 from dotenv import load_dotenv
 from telebot import types
 
-from macro_engine import build_macro_drafts
+import metrics as run_metrics
+from macro_engine import RunConfig, build_macro_drafts, mark_draft_delivered, stream_macro_drafts
+from storage import PendingPostStore, get_cache_dir
+from telegram_delivery import SendStats, TelegramSender
 
 load_dotenv()
 
-DEFAULT_X_INTENT_MAX_CHARS = 280
 DEFAULT_URL_WEIGHT = 23
 
 
@@ -38,15 +40,6 @@ def _normalize_intent_text(text: str) -> str:
     return normalized.replace("%", "%25")
 
 
-def _get_x_intent_max_chars() -> int:
-    raw = (os.getenv("X_INTENT_MAX_CHARS") or "").strip()
-    if raw.isdigit():
-        value = int(raw)
-        if value > 0:
-            return value
-    return DEFAULT_X_INTENT_MAX_CHARS
-
-
 def _extract_intent_hashtags(text: str, max_count: int = 2) -> tuple[str, list[str]]:
     tags = re.findall(r"#([A-Za-zÁÉÍÓÚÜÑáéíóúüñ0-9_]+)", text or "")
     unique: list[str] = []
@@ -200,9 +193,37 @@ if not TELEGRAM_TOKEN or TELEGRAM_CHAT_ID is None:
 
 bot = telebot.TeleBot(TELEGRAM_TOKEN)
 
-pending_posts: Dict[int, str] = {}
+_startup_config = RunConfig.from_env()
+pending_posts = PendingPostStore(
+    os.path.join(get_cache_dir(), "pending_posts.sqlite3"),
+    _startup_config.pending_posts_ttl_hours * 3600,
+    _startup_config.pending_posts_max,
+)
+
+_sender: Optional[TelegramSender] = None
+_sender_lock = threading.Lock()
+
+
+def _get_sender(config: RunConfig) -> TelegramSender:
+    # Un único emisor por proceso: los límites por chat se mantienen entre
+    # el envío programado y los que dispara el chat.
+    global _sender
+    with _sender_lock:
+        if _sender is None:
+            _sender = TelegramSender(
+                bot,
+                config.telegram_chat_msgs_per_min,
+                config.telegram_global_msgs_per_sec,
+                config.telegram_max_retries,
+            )
+        return _sender
 
-def send_drafts(drafts, chat_id):
+
+def send_drafts(drafts, chat_id, config: Optional[RunConfig] = None) -> int:
+    config = config or RunConfig.from_env()
+    sender = _get_sender(config)
+    stats = SendStats()
+    sent = 0
     for index, draft in enumerate(drafts, start=1):
         if isinstance(draft, dict):
             ai_text = (draft.get("ai_text") or draft.get("tweet_text") or draft.get("draft") or "").strip()
@@ -228,7 +249,7 @@ def send_drafts(drafts, chat_id):
             intent_base_text,
             source_url,
             intent_tags,
-            _get_x_intent_max_chars(),
+            config.x_intent_max_chars,
         )
         intent_url = (
             "https://twitter.com/intent/tweet?text="
@@ -248,9 +269,62 @@ def send_drafts(drafts, chat_id):
             types.InlineKeyboardButton("📋 Copiar texto", callback_data="copy"),
             types.InlineKeyboardButton("❌ Descartar", callback_data="discard"),
         )
-        message = bot.send_message(chat_id, caption_text, reply_markup=keyboard)
-        pending_posts[message.message_id] = full_x_text
+        message = sender.send_message(chat_id, caption_text, stats=stats, reply_markup=keyboard)
+        if message is None:
+            continue
+        if isinstance(draft, dict):
+            mark_draft_delivered(draft, config)
+        pending_posts.put(message.message_id, full_x_text)
+        sent += 1
         print(f"[*] Borrador {index} enviado: {full_x_text}")
+    print(stats.report())
+    return sent
+
+
+# Una sola generación a la vez (single-flight): los disparadores que llegan
+# mientras hay una en curso no lanzan otra, y durante DRAFTS_CACHE_SECS los
+# mensajes del chat reciben los últimos borradores en vez de regenerarlos.
+_build_lock = threading.Lock()
+_build_running = False
+_last_drafts: list = []
+_last_drafts_at = 0.0
+
+
+def _claim_build(cache_secs: int) -> tuple[str, list]:
+    global _build_running
+    with _build_lock:
+        if _build_running:
+            return "busy", []
+        if cache_secs > 0 and _last_drafts and time.monotonic() - _last_drafts_at <= cache_secs:
+            return "cached", list(_last_drafts)
+        _build_running = True
+        return "build", []
+
+
+def _collect_drafts(drafts, collected: list):
+    for draft in drafts:
+        collected.append(draft)
+        yield draft
+
+
+def _run_build(chat_id, config: RunConfig) -> int:
+    """Genera y envía borradores; solo tras obtener "build" de _claim_build."""
+    global _build_running, _last_drafts, _last_drafts_at
+    built: list = []
+    try:
+        if config.stream_drafts:
+            drafts = stream_macro_drafts(config)
+        else:
+            drafts = build_macro_drafts(config)
+        sent = send_drafts(_collect_drafts(drafts, built), chat_id, config)
+        run_metrics.current().write(config.metrics_json_path, config.metrics_prom_path)
+        return sent
+    finally:
+        with _build_lock:
+            _build_running = False
+            if built:
+                _last_drafts = built
+                _last_drafts_at = time.monotonic()
 
 
 @bot.message_handler(content_types=["text"])
@@ -261,10 +335,15 @@ def handle_text_message(message):
     if not text:
         return
 
-    drafts = build_macro_drafts()
-    if drafts:
-        send_drafts(drafts, TELEGRAM_CHAT_ID)
-    else:
+    config = RunConfig.from_env()
+    status, cached_drafts = _claim_build(config.drafts_cache_secs)
+    if status == "busy":
+        bot.send_message(TELEGRAM_CHAT_ID, "⏳ Ya se están generando borradores; llegarán en breve.")
+        return
+    if status == "cached":
+        send_drafts(cached_drafts, TELEGRAM_CHAT_ID, config)
+        return
+    if not _run_build(TELEGRAM_CHAT_ID, config):
         bot.send_message(TELEGRAM_CHAT_ID, "No se encontraron borradores hoy.")
 
 
@@ -288,11 +367,11 @@ def handle_callback(call):
             bot.delete_message(call.message.chat.id, message_id)
         except Exception:
             pass
-        pending_posts.pop(message_id, None)
+        pending_posts.pop(message_id)
         return
 
     if call.data == "discard":
-        pending_posts.pop(message_id, None)
+        pending_posts.pop(message_id)
         bot.delete_message(call.message.chat.id, message_id)
         bot.answer_callback_query(call.id, "Descartado.")
         return
@@ -308,10 +387,11 @@ def main():
             if 8 <= now.hour <= 21:
                 current_slot = (now.date(), now.hour)
                 if last_sent != current_slot:
-                    drafts = build_macro_drafts()
-                    if drafts:
-                        send_drafts(drafts, TELEGRAM_CHAT_ID)
-                    else:
+                    # La franja horaria siempre genera borradores nuevos; si ya
+                    # hay una generación en marcha, esa cubre la franja.
+                    config = RunConfig.from_env()
+                    status, _ = _claim_build(0)
+                    if status == "build" and not _run_build(TELEGRAM_CHAT_ID, config):
                         bot.send_message(
                             TELEGRAM_CHAT_ID, "No se encontraron borradores hoy."
                         )
@@ -0,0 +1,131 @@
+import random
+import threading
+import time
+from typing import Optional, Union
+
+import requests
+from telebot.apihelper import ApiTelegramException
+
+import metrics as run_metrics
+from rate_limit import TokenBucket
+
+DEFAULT_BACKOFF_SECS = 1.0
+
+
+class SendStats:
+    """Resultado de un lote de envíos; cada lote lleva el suyo, así dos lotes
+    simultáneos con el mismo `TelegramSender` no se pisan el informe."""
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.latencies: list[float] = []
+
+    def report(self) -> str:
+        if self.latencies:
+            average = sum(self.latencies) / len(self.latencies)
+            slowest = max(self.latencies)
+        else:
+            average = slowest = 0.0
+        return (
+            f"[*] Telegram: {self.sent} enviados, {self.failed} fallidos, "
+            f"{self.retries} reintentos, latencia media {average:.2f}s (máx {slowest:.2f}s)."
+        )
+
+
+class TelegramSender:
+    """Cola de envío a Telegram con límite global y por chat.
+
+    Respeta `retry_after` de los 429 (flood control) y reintenta con backoff
+    los errores transitorios (5xx, red). Un borrador que no se puede enviar
+    se descarta sin cortar el resto del lote. Se puede compartir entre
+    hilos: los límites son comunes y las cifras de cada lote van en el
+    `SendStats` que se pasa a `send_message`.
+    """
+
+    def __init__(
+        self,
+        bot,
+        chat_per_minute: int,
+        global_per_second: int,
+        max_retries: int,
+    ):
+        self.bot = bot
+        self.chat_per_minute = chat_per_minute
+        self.max_retries = max_retries
+        self._global_bucket = TokenBucket(global_per_second * 60, global_per_second)
+        self._chat_buckets: dict[Union[int, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        with self._lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = TokenBucket(self.chat_per_minute, 1)
+                self._chat_buckets[chat_id] = bucket
+            return bucket
+
+    def send_message(
+        self,
+        chat_id: Union[int, str],
+        text: str,
+        stats: Optional[SendStats] = None,
+        **kwargs,
+    ):
+        stats = stats if stats is not None else SendStats()
+        chat_bucket = self._chat_bucket(chat_id)
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            chat_bucket.acquire()
+            self._global_bucket.acquire()
+            try:
+                message = self.bot.send_message(chat_id, text, **kwargs)
+            except ApiTelegramException as exc:
+                delay = self._retry_delay(exc, attempt)
+                if delay is None or attempt >= self.max_retries:
+                    return self._give_up(exc, stats)
+                if exc.error_code == 429:
+                    chat_bucket.penalize(delay)
+                    self._global_bucket.penalize(delay)
+                print(f"[!] Telegram {exc.error_code}: reintento en {delay:.1f}s.")
+            except requests.exceptions.RequestException as exc:
+                if attempt >= self.max_retries:
+                    return self._give_up(exc, stats)
+                delay = self._backoff(attempt)
+                print(f"[!] Telegram sin respuesta: reintento en {delay:.1f}s.")
+            else:
+                elapsed = time.monotonic() - started
+                stats.sent += 1
+                stats.latencies.append(elapsed)
+                metrics = run_metrics.current()
+                metrics.observe("telegram_send_seconds", elapsed)
+                metrics.inc("telegram_messages", status="sent")
+                return message
+            stats.retries += 1
+            run_metrics.current().inc("telegram_retries")
+            attempt += 1
+            time.sleep(delay)
+
+    def _retry_delay(self, exc: ApiTelegramException, attempt: int) -> Optional[float]:
+        if exc.error_code == 429:
+            parameters = (exc.result_json or {}).get("parameters") or {}
+            retry_after = parameters.get("retry_after")
+            if isinstance(retry_after, (int, float)) and retry_after > 0:
+                return float(retry_after)
+            return self._backoff(attempt)
+        if exc.error_code >= 500:
+            return self._backoff(attempt)
+        return None
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return DEFAULT_BACKOFF_SECS * (2 ** attempt) + random.uniform(0, DEFAULT_BACKOFF_SECS)
+
+    @staticmethod
+    def _give_up(exc: Exception, stats: SendStats) -> None:
+        stats.failed += 1
+        run_metrics.current().inc("telegram_messages", status="failed")
+        print(f"[!] No se pudo enviar el borrador a Telegram: {exc}")
+        return None